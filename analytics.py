@@ -0,0 +1,225 @@
+"""Calorie goal and adherence math shared by the API, reports and scripts.
+
+calculate_calorie_goal() is the survey formula. analyze_range() works on
+whole date ranges at once: db.get_day_series() returns one column per
+field (one entry per calendar day, from a single query), and every derived
+column - net calories, percent of goal reached, rolling 7/30-day averages -
+is computed column-wise. NumPy is used when it is installed; otherwise the
+same arithmetic runs as plain list passes, with identical results.
+"""
+import math
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # optional, the pure-Python path below is used instead
+    np = None
+
+# 1 pound of body weight is approximately 3500 calories
+CALORIES_PER_POUND = 3500
+# Simple "maintenance" estimate: ~15 calories per pound of body weight
+MAINTENANCE_PER_POUND = 15
+MIN_DAILY_CALORIES = 1200
+
+ROLLING_WINDOWS = (7, 30)
+# Days of history read before a range so its first rolling averages are full
+LOOKBACK_DAYS = max(ROLLING_WINDOWS) - 1
+# Projections further out than this are reported as not on track
+MAX_PROJECTION_DAYS = 3650
+
+
+def calculate_calorie_goal(age, current_weight, goal_weight, weeks):
+    """Calculate daily calorie goal based on user input"""
+    days = weeks * 7
+    pounds_change = goal_weight - current_weight  # positive = gain, negative = lose
+    total_calorie_change = pounds_change * CALORIES_PER_POUND
+
+    if days != 0:
+        daily_calorie_change = total_calorie_change / days
+    else:
+        daily_calorie_change = 0
+
+    estimated_maintenance = current_weight * MAINTENANCE_PER_POUND
+    suggested_daily_calories = estimated_maintenance + daily_calorie_change
+
+    # Make sure daily calories are not unrealistically low
+    if suggested_daily_calories < MIN_DAILY_CALORIES:
+        suggested_daily_calories = MIN_DAILY_CALORIES
+
+    return {
+        "age": age,
+        "current_weight": current_weight,
+        "goal_weight": goal_weight,
+        "weeks": weeks,
+        "days": days,
+        "pounds_change": pounds_change,
+        "total_calorie_change": total_calorie_change,
+        "daily_calorie_change": daily_calorie_change,
+        "estimated_maintenance": estimated_maintenance,
+        "daily_calorie_goal": suggested_daily_calories
+    }
+
+
+def percent_reached(net_calories, daily_goal):
+    """Percent of the goal reached, capped to 0..100 (0 without a goal)."""
+    if not daily_goal or daily_goal <= 0:
+        return 0
+    return int(round(max(0, min(100, (net_calories / daily_goal) * 100))))
+
+
+# -----------------------------
+#   COLUMN OPERATIONS
+# -----------------------------
+# Missing values are None in the pure-Python path and NaN with NumPy.
+
+def _net(eaten, burned, logged):
+    if np is not None:
+        return np.where(logged, eaten - burned, np.nan)
+    return [e - b if has else None for e, b, has in zip(eaten, burned, logged)]
+
+
+def _percent(net, goal):
+    if np is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            raw = np.clip(net * 100.0 / goal, 0, 100)
+        return np.where(goal > 0, np.round(raw), np.nan)
+    return [percent_reached(n, g) if n is not None and g else None for n, g in zip(net, goal)]
+
+
+def _rolling_mean(values, window):
+    """Mean of the non-missing values in each trailing window (one pass)."""
+    if np is not None:
+        present = ~np.isnan(values)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(present)))
+        ends = np.arange(1, len(values) + 1)
+        starts = np.maximum(ends - window, 0)
+        n = counts[ends] - counts[starts]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(n > 0, (sums[ends] - sums[starts]) / n, np.nan)
+
+    result, sums, counts = [], [0.0], [0]
+    for i, value in enumerate(values):
+        sums.append(sums[-1] + (value if value is not None else 0.0))
+        counts.append(counts[-1] + (value is not None))
+        lo = max(i + 1 - window, 0)
+        n = counts[i + 1] - counts[lo]
+        result.append((sums[i + 1] - sums[lo]) / n if n else None)
+    return result
+
+
+def _to_list(column, cast=float):
+    """Plain Python list with None for missing values (JSON-friendly)."""
+    if np is not None:
+        return [None if math.isnan(v) else cast(v) for v in np.asarray(column, dtype=float).tolist()]
+    return list(column)
+
+
+# -----------------------------
+#   RANGE ANALYSIS
+# -----------------------------
+
+def analyze_range(series, first_day=None, goal_weight=None, current_weight=None):
+    """Per-day adherence, rolling averages and a goal-weight projection.
+
+    series is the output of db.get_day_series(); pass a range that starts
+    LOOKBACK_DAYS before first_day so the rolling averages of the first
+    reported days have their full history. Days without any entry count
+    as missing, not as zero calories.
+    """
+    dates = series['date']
+    if np is not None:
+        eaten = np.asarray(series['calories_eaten'], dtype=float)
+        burned = np.asarray(series['calories_burned'], dtype=float)
+        logged = np.asarray(series['entries'], dtype=int) > 0
+        goal = np.asarray([g if g is not None else np.nan for g in series['daily_goal']], dtype=float)
+    else:
+        eaten, burned = series['calories_eaten'], series['calories_burned']
+        logged = [n > 0 for n in series['entries']]
+        goal = series['daily_goal']
+
+    net = _net(eaten, burned, logged)
+    columns = {
+        'date': list(dates),
+        'calories_eaten': _to_list(eaten),
+        'calories_burned': _to_list(burned),
+        'net_calories': _to_list(net),
+        'daily_goal': _to_list(goal),
+        'percent_reached': _to_list(_percent(net, goal), int),
+        'weight': list(series['weight']),
+    }
+    for window in ROLLING_WINDOWS:
+        columns[f'avg_net_{window}d'] = _to_list(_rolling_mean(net, window))
+
+    skip = dates.index(first_day) if first_day in dates else 0
+    days = [dict(zip(columns, row)) for row in zip(*columns.values())][skip:]
+
+    return {
+        'days': days,
+        'summary': _summarize(days),
+        'projection': project_goal_date(columns, goal_weight, current_weight),
+    }
+
+
+def _summarize(days):
+    logged = [d for d in days if d['net_calories'] is not None]
+    with_goal = [d for d in logged if d['daily_goal']]
+    return {
+        'days': len(days),
+        'days_logged': len(logged),
+        'avg_net_calories': sum(d['net_calories'] for d in logged) / len(logged) if logged else None,
+        'avg_percent_reached': (sum(d['percent_reached'] for d in with_goal) / len(with_goal)
+                                if with_goal else None),
+        'days_within_goal': sum(d['net_calories'] <= d['daily_goal'] for d in with_goal) if with_goal else None,
+    }
+
+
+def project_goal_date(columns, goal_weight, current_weight=None):
+    """When the goal weight is reached if the last 30 days' intake continues.
+
+    Starts from the latest weight in the range (or current_weight), takes
+    maintenance as MAINTENANCE_PER_POUND per pound and converts the daily
+    surplus or deficit to pounds. projected_date is None when the trend
+    points away from the goal or would take longer than MAX_PROJECTION_DAYS.
+    """
+    if not columns['date'] or goal_weight is None:
+        return None
+    weight = next((w for w in reversed(columns['weight']) if w is not None), current_weight)
+    avg_net = columns[f'avg_net_{max(ROLLING_WINDOWS)}d'][-1]
+    if weight is None or avg_net is None:
+        return None
+
+    last_day = date.fromisoformat(columns['date'][-1])
+    daily_change = calorie_weight_change(avg_net, weight)
+    projected = goal_date(last_day, weight, goal_weight, daily_change)
+
+    return {
+        'from_date': last_day.isoformat(),
+        'weight': weight,
+        'goal_weight': goal_weight,
+        'avg_net_calories': avg_net,
+        'pounds_per_week': daily_change * 7,
+        'projected_date': projected.isoformat() if projected else None,
+    }
+
+
+def calorie_weight_change(avg_net_calories, weight):
+    """Pounds per day implied by eating avg_net_calories at this weight."""
+    return (avg_net_calories - weight * MAINTENANCE_PER_POUND) / CALORIES_PER_POUND
+
+
+def goal_date(from_day, weight, goal_weight, daily_change):
+    """Date goal_weight is reached from weight at daily_change lbs/day.
+
+    None when the change points away from the goal, is zero, or would take
+    longer than MAX_PROJECTION_DAYS.
+    """
+    to_go = goal_weight - weight
+    if to_go == 0:
+        return from_day
+    if not daily_change or (to_go > 0) != (daily_change > 0):
+        return None
+    days_needed = math.ceil(to_go / daily_change)
+    if days_needed > MAX_PROJECTION_DAYS:
+        return None
+    return from_day + timedelta(days=days_needed)
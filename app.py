@@ -14,67 +14,172 @@
 #   The program runs in a loop with a text-based menu so the user
 #   can perform multiple actions in one session.
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory
+import time
+_boot_started = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 from datetime import datetime, timedelta
+from itertools import islice
 import json
 import os
 import logging
+import secrets
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
-app.secret_key = 'aaa_fitness_tracker_secret_key_12345'
+# The signed session cookie is what identifies a user, so its key has to be
+# secret and comes from the environment. FLASK_DEBUG=1 (local development
+# only) falls back to a random per-process key that logs everyone out on
+# restart.
+app.secret_key = os.environ.get('SECRET_KEY')
+if not app.secret_key:
+    if os.environ.get('FLASK_DEBUG', '').lower() not in ('1', 'true', 'yes', 'on'):
+        raise RuntimeError("SECRET_KEY is not set. It signs the session cookie that identifies each user; "
+                           "set it (or FLASK_DEBUG=1 for a throwaway development key) before starting the app.")
+    app.secret_key = secrets.token_hex(32)
 app.config['SESSION_COOKIE_SECURE'] = False  # Allow HTTP (development)
-app.config['SESSION_COOKIE_HTTPONLY'] = False
+# The cookie is the only credential; page scripts never need to read it
+app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.permanent_session_lifetime = timedelta(days=7)
 
-# Initialize DB and keep using session for profile
+# Initialize DB; the session only keeps the user id, profiles live in the DB
+import analytics
+import assets
+import cache
 import db
-db.init_db()
-
-# Import teammate modules (for reference - their code is incorporated into this Flask app)
-# These modules contain the original command-line versions of the fitness tracker
+import metrics
+import scheduler
+from analytics import calculate_calorie_goal
+from etags import conditional
+from tracking import tracking_bp
+from users import adopt_session_profile, current_profile, current_user_id
+_imported = time.perf_counter()
+# Only reads PRAGMA user_version when the schema is already current
+schema_found = db.init_db()
+_schema_ready = time.perf_counter()
+db.init_app(app)
+metrics.init_app(app)
+# Hashed, precompressed scripts/styles from `python build_assets.py`
+assets.init_app(app)
+
+# The original command-line versions of the tracker are replaced by
+# fitness_cli.py, which works on the same database as this app
 
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Helper functions
-def calculate_calorie_goal(age, current_weight, goal_weight, weeks):
-    """Calculate daily calorie goal based on user input"""
-    days = weeks * 7
-    pounds_change = goal_weight - current_weight
-    total_calorie_change = pounds_change * 3500
-    
-    if days != 0:
-        daily_calorie_change = total_calorie_change / days
+def parse_workout(data):
+    """Validate one workout payload and return (date, name, duration, calories).
+
+    Raises ValueError with the message the API reports for a bad entry.
+    """
+    try:
+        date = data.get('date')
+        name = data.get('exercise_name')
+        duration = float(data.get('duration'))
+        calories = float(data.get('calories'))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid input values")
+    if not date or not name or duration <= 0 or calories <= 0:
+        raise ValueError("Invalid input")
+    return date, name, duration, calories
+
+
+def parse_meal(data):
+    """Validate one meal payload and return (date, description, calories)."""
+    try:
+        date = data.get('date')
+        description = data.get('description')
+        calories = float(data.get('calories'))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid input values")
+    if not date or not description or calories <= 0:
+        raise ValueError("Invalid input")
+    return date, description, calories
+
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/jsonlines')
+MAX_REPORTED_ERRORS = 100
+# Rows parsed from a bulk upload per insert transaction
+BULK_CHUNK_ROWS = 1000
+
+
+def iter_bulk_entries():
+    """Yield the entries of a bulk request body.
+
+    Accepts a JSON array, or NDJSON (one object per line) which is read
+    from the request stream line by line so large uploads are never held
+    in memory as a whole. Lines that are not valid JSON are yielded as
+    None so they are reported as bad entries.
+    """
+    if request.mimetype in NDJSON_TYPES:
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
     else:
-        daily_calorie_change = 0
-    
-    estimated_maintenance = current_weight * 15
-    suggested_daily_calories = estimated_maintenance + daily_calorie_change
-    
-    if suggested_daily_calories < 1200:
-        suggested_daily_calories = 1200
-    
-    return {
-        "age": age,
-        "current_weight": current_weight,
-        "goal_weight": goal_weight,
-        "weeks": weeks,
-        "days": days,
-        "pounds_change": pounds_change,
-        "total_calorie_change": total_calorie_change,
-        "daily_calorie_change": daily_calorie_change,
-        "estimated_maintenance": estimated_maintenance,
-        "daily_calorie_goal": suggested_daily_calories
-    }
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON array of entries")
+        yield from data
+
+
+def bulk_insert(parse, insert):
+    """Validate entries from the request body and insert the good ones.
+
+    Invalid entries are skipped and reported by their position in the
+    body; they never abort the rest of the batch.
+
+    The body is parsed BULK_CHUNK_ROWS valid entries at a time and each
+    chunk is inserted in its own short transaction, so the write lock is
+    never held while waiting on the client. An upload that breaks off
+    part way keeps the chunks already inserted (use /api/sync with
+    client_ids for uploads that must be safe to retry).
+    """
+    errors = []
+    error_count = 0
+
+    def valid_rows():
+        nonlocal error_count
+        for index, entry in enumerate(iter_bulk_entries()):
+            try:
+                yield parse(entry)
+            except ValueError as e:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"index": index, "error": str(e)})
+
+    user_id = current_user_id()
+    inserted = 0
+    try:
+        rows = valid_rows()
+        while chunk := list(islice(rows, BULK_CHUNK_ROWS)):
+            inserted += insert(user_id, chunk)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, "inserted": inserted, "rejected": error_count, "errors": errors})
 
 
 @app.route('/')
 def index():
     """Home page - serve the static HTML fitness tracker"""
     # Serve the index.html file which contains the full client-side app
-    return send_from_directory('.', 'index.html')
+    # (the minified build from dist/ when there is one)
+    return assets.send_page('index.html')
+
+
+@app.before_request
+def start_background_jobs():
+    # Day finalization and rollup refreshes run off the request path. Started
+    # here rather than at import so the thread lives in the process serving
+    # requests, never in a preloaded gunicorn master (a no-op once running)
+    scheduler.start_in_background()
 
 
 @app.before_request
@@ -82,6 +187,7 @@ def make_session_permanent():
     """Make sessions permanent"""
     session.permanent = True
     app.permanent_session_lifetime = timedelta(days=7)
+    adopt_session_profile()
 
 
 @app.route('/api/survey', methods=['POST'])
@@ -98,15 +204,15 @@ def submit_survey():
         goal_weight = float(data.get('goal_weight', 0))
         weeks = float(data.get('weeks', 0))
         
+        # The new goal applies from this date on (default today)
+        effective_from = datetime.fromisoformat(data.get('effective_from') or datetime.now().date().isoformat()).date()
+
         if age <= 0 or current_weight <= 0 or weeks <= 0:
             return jsonify({"error": "Age, weight, and timeline must be positive"}), 400
         
         profile = calculate_calorie_goal(age, current_weight, goal_weight, weeks)
         
-        # Save to session
-        session['user_profile'] = profile
-        session.permanent = True
-        session.modified = True
+        db.save_profile(current_user_id(), profile, effective_from.isoformat())
 
         logger.info("Survey submitted successfully")
 
@@ -122,109 +228,304 @@ def submit_survey():
 @app.route('/api/add-workout', methods=['POST'])
 def add_workout():
     """Add a new workout"""
-    if 'user_profile' not in session:
+    if current_profile() is None:
         return jsonify({"error": "User profile not found"}), 400
     
-    data = request.json
-    
     try:
-        date = data.get('date')
-        name = data.get('exercise_name')
-        duration = float(data.get('duration'))
-        calories = float(data.get('calories'))
-        
-        if not date or not name or duration <= 0 or calories <= 0:
-            return jsonify({"error": "Invalid input"}), 400
-        
-        db.add_workout(date, name, duration, calories)
-        return jsonify({"success": True, "message": "Workout added successfully"})
-    except (ValueError, TypeError):
-        return jsonify({"error": "Invalid input values"}), 400
+        date, name, duration, calories = parse_workout(request.json)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db.add_workout(current_user_id(), date, name, duration, calories)
+    return jsonify({"success": True, "message": "Workout added successfully"})
+
+
+@app.route('/api/add-workouts', methods=['POST'])
+def add_workouts():
+    """Add many workouts at once (JSON array or NDJSON body)"""
+    if current_profile() is None:
+        return jsonify({"error": "User profile not found"}), 400
+    return bulk_insert(parse_workout, db.add_workouts)
 
 
 @app.route('/api/workouts/<date>')
 def get_workouts(date):
     """Get all workouts for a specific date"""
-    workouts, total_calories = db.get_workouts_for_date(date)
-    return jsonify({"workouts": workouts, "total_calories": total_calories})
+    user_id = current_user_id(create=False)
+
+    def build():
+        workouts, total_calories = db.get_workouts_for_date(user_id, date)
+        return jsonify({"workouts": workouts, "total_calories": total_calories})
+
+    return conditional(user_id, date, build)
 
 
 @app.route('/api/all-workouts')
 def get_all_workouts():
     """Get all workouts grouped by date"""
-    return jsonify(workouts_data)
+    return jsonify(db.get_all_workouts(current_user_id(create=False)))
 
 
 @app.route('/api/add-meal', methods=['POST'])
 def add_meal():
     """Add a new meal"""
-    if 'user_profile' not in session:
+    if current_profile() is None:
         return jsonify({"error": "User profile not found"}), 400
     
-    data = request.json
-    
     try:
-        date = data.get('date')
-        description = data.get('description')
-        calories = float(data.get('calories'))
-        
-        if not date or not description or calories <= 0:
-            return jsonify({"error": "Invalid input"}), 400
-        
-        db.add_meal(date, description, calories)
-        return jsonify({"success": True, "message": "Meal added successfully"})
-    except (ValueError, TypeError):
-        return jsonify({"error": "Invalid input values"}), 400
+        date, description, calories = parse_meal(request.json)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db.add_meal(current_user_id(), date, description, calories)
+    return jsonify({"success": True, "message": "Meal added successfully"})
+
+
+@app.route('/api/add-meals', methods=['POST'])
+def add_meals():
+    """Add many meals at once (JSON array or NDJSON body)"""
+    if current_profile() is None:
+        return jsonify({"error": "User profile not found"}), 400
+    return bulk_insert(parse_meal, db.add_meals)
+
+
+SYNC_BATCH_LIMIT = 500
+
+
+@app.route('/api/sync', methods=['GET'])
+def pull_changes():
+    """Return the user's changes after ?since=<cursor>, oldest first
+
+    Keep calling with the returned cursor while "more" is true.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = max(1, min(int(request.args.get('limit', SYNC_BATCH_LIMIT)), SYNC_BATCH_LIMIT))
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
+    changes, cursor = db.get_changes(current_user_id(create=False), since, limit)
+    return jsonify({"changes": changes, "cursor": cursor, "more": len(changes) == limit})
+
+
+@app.route('/api/sync', methods=['POST'])
+def push_changes():
+    """Upload entries created offline
+
+    Body: {"meals": [...], "workouts": [...], "weights": [...]}, at most
+    SYNC_BATCH_LIMIT items per list. Meals and workouts carry a client_id
+    so a retried upload is applied only once. Invalid items are reported
+    and skipped.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    batches = {key: data.get(key) or [] for key in ('meals', 'workouts', 'weights')}
+    if any(not isinstance(items, list) or len(items) > SYNC_BATCH_LIMIT for items in batches.values()):
+        return jsonify({"error": f"meals, workouts and weights must be lists of at most {SYNC_BATCH_LIMIT} items"}), 400
+
+    user_id = current_user_id()
+    rejected = []
+
+    def with_client_ids(entity, parse, items):
+        for item in items:
+            client_id = item.get('client_id') if isinstance(item, dict) else None
+            try:
+                if not client_id:
+                    raise ValueError("client_id is required")
+                yield parse(item) + (str(client_id),)
+            except ValueError as e:
+                rejected.append({"entity": entity, "client_id": client_id, "error": str(e)})
+
+    db.add_meals(user_id, with_client_ids('meal', parse_meal, batches['meals']))
+    db.add_workouts(user_id, with_client_ids('workout', parse_workout, batches['workouts']))
+    for item in batches['weights']:
+        try:
+            db.add_weight(user_id, item['date'], float(item['weight']))
+        except (KeyError, TypeError, ValueError) as e:
+            rejected.append({"entity": "weight", "client_id": None, "error": f"invalid data: {e}"})
+
+    return jsonify({"success": True, "rejected": rejected})
+
+
+SUGGEST_KINDS = {'meals': ('meal', 'description'), 'workouts': ('workout', 'name')}
+
+
+@app.route('/api/suggest/<kind>')
+def suggest(kind):
+    """Past meals or workouts matching ?q= (prefix search), for prefilling forms
+
+    Each suggestion carries the average calories (and duration for
+    workouts) it was logged with.
+    """
+    if kind not in SUGGEST_KINDS:
+        return jsonify({"error": "Unknown suggestion type"}), 404
+    entity, text_field = SUGGEST_KINDS[kind]
+    try:
+        limit = max(1, min(int(request.args.get('limit', db.SUGGEST_LIMIT)), 50))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    suggestions = []
+    for row in db.suggest(current_user_id(create=False), entity, request.args.get('q', ''), limit):
+        item = {text_field: row['text'], "calories": round(row['calories'], 1),
+                "uses": row['uses'], "last_used": row['last_date']}
+        if entity == 'workout':
+            item["duration"] = round(row['duration'], 1)
+        suggestions.append(item)
+    return jsonify({"suggestions": suggestions})
 
 
 @app.route('/api/meals/<date>')
 def get_meals(date):
     """Get all meals for a specific date"""
-    meals, total_calories = db.get_meals_for_date(date)
-    return jsonify({"meals": meals, "total_calories": total_calories})
+    user_id = current_user_id(create=False)
+
+    def build():
+        meals, total_calories = db.get_meals_for_date(user_id, date)
+        return jsonify({"meals": meals, "total_calories": total_calories})
+
+    return conditional(user_id, date, build)
 
 
 @app.route('/api/daily-summary/<date>')
 def get_daily_summary(date):
     """Get daily summary for a specific date"""
-    if 'user_profile' not in session:
+    if current_profile() is None:
         return jsonify({"error": "User profile not found"}), 400
-    workouts, calories_burned = db.get_workouts_for_date(date)
-    meals, calories_eaten = db.get_meals_for_date(date)
-    net_calories = calories_eaten - calories_burned
-    daily_goal = session['user_profile']['daily_calorie_goal']
-    
+    user_id = current_user_id(create=False)
+    daily_goal = db.goal_for_date(user_id, date)
+
+    def build():
+        summary = db.get_day_summary(user_id, date)
+        calories_burned = summary['calories_burned']
+        calories_eaten = summary['calories_eaten']
+        net_calories = calories_eaten - calories_burned
+        return jsonify({
+            "date": date,
+            "workouts": summary['workouts'],
+            "meals": summary['meals'],
+            "calories_burned": calories_burned,
+            "calories_eaten": calories_eaten,
+            "net_calories": net_calories,
+            "daily_goal": daily_goal,
+            "remaining": daily_goal - net_calories
+        })
+
+    # The body also depends on the goal, which is versioned separately
+    return conditional(user_id, date, build, daily_goal)
+
+
+MAX_RANGE_DAYS = 3660
+
+
+def parse_range(default_days=30):
+    """Read ?start=&end= (YYYY-MM-DD), defaulting to the last default_days days.
+
+    Raises ValueError with the message to report for a bad range.
+    """
+    try:
+        end = datetime.fromisoformat(request.args['end']).date() if request.args.get('end') else datetime.now().date()
+        start = datetime.fromisoformat(request.args['start']).date() if request.args.get('start') else end - timedelta(days=default_days - 1)
+    except ValueError:
+        raise ValueError("start and end must be dates (YYYY-MM-DD)")
+    if start > end:
+        raise ValueError("start must not be after end")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"ranges are limited to {MAX_RANGE_DAYS} days")
+    return start, end
+
+
+@app.route('/api/trends')
+def get_trends():
+    """Get calorie and goal-adherence rollups over a date range
+
+    Query: start, end (YYYY-MM-DD, default the last 30 days) and
+    bucket=day|week|month (default day).
+    """
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in db.TREND_BUCKETS:
+        return jsonify({"error": "bucket must be day, week or month"}), 400
+    try:
+        start, end = parse_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    user_id = current_user_id(create=False)
+    buckets = db.get_trends(user_id, start.isoformat(), end.isoformat(), bucket)
     return jsonify({
-        "date": date,
-        "workouts": workouts,
-        "meals": meals,
-        "calories_burned": calories_burned,
-        "calories_eaten": calories_eaten,
-        "net_calories": net_calories,
-        "daily_goal": daily_goal,
-        "remaining": daily_goal - net_calories
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "bucket": bucket,
+        "daily_goal": db.goal_for_date(user_id, end.isoformat()),
+        "buckets": buckets
     })
 
 
+@app.route('/api/analytics')
+def get_analytics():
+    """Per-day adherence with rolling 7/30-day averages over a date range
+
+    Query: start, end (YYYY-MM-DD, default the last 30 days). Also returns
+    a range summary and the projected date of reaching the goal weight.
+    """
+    try:
+        start, end = parse_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    user_id = current_user_id(create=False)
+    profile = db.get_profile(user_id) if user_id is not None else None
+
+    # Read LOOKBACK_DAYS extra so the first days' rolling averages are complete
+    first = start - timedelta(days=analytics.LOOKBACK_DAYS)
+    series = db.get_day_series(user_id, first.isoformat(), end.isoformat())
+    result = analytics.analyze_range(series, start.isoformat(),
+                                     goal_weight=profile['goal_weight'] if profile else None,
+                                     current_weight=profile['current_weight'] if profile else None)
+    return jsonify({"start": start.isoformat(), "end": end.isoformat(), **result})
+
+
+@app.route('/api/profile')
+def get_profile():
+    """Current profile and the history of goals (oldest first)"""
+    user_id = current_user_id(create=False)
+    history = db.get_profile_history(user_id) if user_id is not None else []
+    if not history:
+        return jsonify({"error": "User profile not found"}), 404
+    latest = history[-1]
+    profile = calculate_calorie_goal(latest['age'], latest['current_weight'], latest['goal_weight'], latest['weeks'])
+    return jsonify({"profile": profile, "effective_from": latest['effective_from'], "history": history})
+
+
+@app.route('/api/cache-stats')
+def get_cache_stats():
+    """Hit/miss counters of the read cache"""
+    return jsonify(cache.get_cache().stats())
+
+
 @app.route('/api/reset-profile', methods=['POST'])
 def reset_profile():
     """Reset user profile and start over"""
+    user_id = current_user_id(create=False)
     # Clear session profile
     session.clear()
-    # Also clear persisted user data so the dashboard shows empty state
+    # Also clear this user's persisted data so the dashboard shows empty state
     try:
-        db.clear_all_data()
+        if user_id is not None:
+            db.clear_user_data(user_id)
     except Exception as e:
         logger.warning("Warning: failed to clear DB during reset: %s", e)
     return jsonify({"success": True})
 
 
 # Register tracking blueprint (adds /api/complete-day, /api/weight, /api/weights)
-try:
-    from tracking import tracking_bp
-    app.register_blueprint(tracking_bp)
-except Exception as e:
-    logger.warning("Warning: failed to register tracking blueprint: %s", e)
+app.register_blueprint(tracking_bp)
+
+_booted = time.perf_counter()
+metrics.record_boot(imports=_imported - _boot_started, schema=_schema_ready - _imported,
+                    setup=_booted - _schema_ready, total=_booted - _boot_started)
+logger.info("App loaded in %.0f ms (imports %.0f ms, schema check %.0f ms, schema v%d -> v%d) pid=%d",
+            (_booted - _boot_started) * 1000, (_imported - _boot_started) * 1000,
+            (_schema_ready - _imported) * 1000, schema_found, db.SCHEMA_VERSION, os.getpid())
 
 
 if __name__ == '__main__':
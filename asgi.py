@@ -0,0 +1,64 @@
+# ASGI entry point for the fitness tracker.
+#
+# Run with:
+#     uvicorn asgi:app --host 0.0.0.0 --port $PORT
+# or under gunicorn (see gunicorn.conf.py):
+#     gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+#
+# The event loop owns the sockets, so slow clients and idle keep-alive
+# connections cost no thread. The Flask app itself is bridged by a2wsgi:
+# each request's handler (every /api/* route, including the tracking
+# blueprint) runs on a bounded pool of ASGI_THREADS threads, and SQLite is
+# only ever touched from those threads, each of which keeps its own pooled
+# connection from db.get_conn(). Requests beyond the pool size wait in the
+# executor queue instead of blocking the loop. The plain WSGI app
+# (gunicorn app:app) keeps working unchanged.
+#
+# On top of a2wsgi this module only:
+#     - joins split Cookie headers (HTTP/2 clients send one per cookie)
+#       with "; " instead of the "," used for other repeated headers, so
+#       the session cookie still parses
+#     - on shutdown, drains the pool and flushes the group-commit writer
+#       from a thread, keeping the event loop free while it waits
+
+import asyncio
+import os
+
+from a2wsgi import WSGIMiddleware
+
+import writer
+from app import app as flask_app
+
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
+wsgi = WSGIMiddleware(flask_app, workers=ASGI_THREADS)
+
+
+def _join_cookie_headers(headers):
+    """Merge repeated cookie headers into one, joined by "; " (RFC 9113 8.2.3)."""
+    cookies = [value for name, value in headers if name == b'cookie']
+    if len(cookies) < 2:
+        return headers
+    merged = [(name, value) for name, value in headers if name != b'cookie']
+    merged.append((b'cookie', b'; '.join(cookies)))
+    return merged
+
+
+def _shutdown():
+    wsgi.executor.shutdown(wait=True)
+    writer.close()
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, _shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] == 'http':
+        scope = dict(scope, headers=_join_cookie_headers(scope.get('headers', [])))
+    await wsgi(scope, receive, send)
@@ -0,0 +1,82 @@
+"""Serving layer for the front end built by build_assets.py.
+
+    - /assets/<name>: content-hashed scripts and stylesheets from dist/.
+      A new build gives a changed file a new name, so these are cached for
+      a year with "immutable" and never revalidated.
+    - index.html comes from dist/ when it exists and is revalidated on
+      every load (ETag + no-cache), so a deploy shows up right away while
+      the hashed files it points to stay cached.
+Both pick the precompressed .br or .gz variant the client accepts
+(Accept-Encoding) and send Vary: Accept-Encoding. Without a build the
+source files are served as before.
+"""
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIST = os.path.join(ROOT, 'dist')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# Best compression first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = {}
+
+
+def load_manifest(dist=DIST):
+    """Logical name -> hashed file name, empty when there is no build."""
+    try:
+        with open(os.path.join(dist, 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _negotiate(path):
+    """The best variant of path the client accepts, and its encoding."""
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def send_built(path, cache_control):
+    """Send a built file (or a compressed variant of it) with cache headers."""
+    variant, encoding = _negotiate(path)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    # etag=True derives it from the variant's name, size and mtime, so each
+    # encoding gets its own
+    response = send_file(variant, mimetype=mimetype, conditional=True, etag=True, max_age=None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def send_page(name):
+    """A page from the build, or the source file when there is none."""
+    built = safe_join(DIST, name)
+    if built and os.path.isfile(built):
+        return send_built(built, REVALIDATE)
+    response = send_file(os.path.join(ROOT, name), conditional=True, etag=True, max_age=None)
+    response.headers['Cache-Control'] = REVALIDATE
+    return response
+
+
+def init_app(app):
+    """Serve the hashed files of the build under /assets/."""
+    global _manifest
+    _manifest = load_manifest()
+
+    @app.route('/assets/<path:filename>')
+    def built_asset(filename):
+        path = safe_join(DIST, filename)
+        if path is None or filename not in _manifest.values() or not os.path.isfile(path):
+            abort(404)
+        return send_built(path, IMMUTABLE)
@@ -0,0 +1,289 @@
+# Program Name: benchmark.py
+#
+# Description:
+#   Reproducible load test for the HTTP API. It:
+#       - Seeds a separate SQLite file with synthetic histories
+#         (users x days x meals/workouts per day, plus weekly weights)
+#       - Drives the real endpoints either in-process through the Flask
+#         test client or over HTTP against a local gunicorn
+#       - Reports throughput and p50/p95/p99 latency per endpoint as JSON
+#       - Compares the result with a saved baseline and fails on regressions
+#
+# Usage:
+#   python benchmark.py --users 20 --days 365 --out results.json
+#   python benchmark.py --driver gunicorn --concurrency 16 --baseline results.json
+#
+# The seeded database lives in a temporary directory (or --db) and is
+# passed to the app through FITNESS_DB_PATH, so data.db is never touched.
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+START_DATE = date(2024, 1, 1)
+PROFILE = {"age": 30, "current_weight": 200, "goal_weight": 180, "weeks": 20}
+
+MEAL_NAMES = ["Breakfast - oatmeal", "Lunch - salad", "Dinner - chicken", "Snack - apple", "Protein shake"]
+WORKOUT_NAMES = ["Running", "Squats", "Cycling", "Swimming", "Yoga"]
+
+
+# -----------------------------
+#   SEEDING
+# -----------------------------
+
+def seed(db_path, users, days, meals_per_day, workouts_per_day, rng):
+    """Fill db_path with synthetic data and return the seeded user ids."""
+    os.environ['FITNESS_DB_PATH'] = str(db_path)
+    import db
+    db.DB_PATH = Path(db_path)
+    db.init_db()
+    from analytics import calculate_calorie_goal
+    profile = calculate_calorie_goal(**PROFILE)
+
+    user_ids = []
+    for _ in range(users):
+        user_id = db.create_user()
+        user_ids.append(user_id)
+        db.save_profile(user_id, profile, START_DATE.isoformat())
+        dates = [(START_DATE + timedelta(days=d)).isoformat() for d in range(days)]
+        db.add_meals(user_id, ((d, rng.choice(MEAL_NAMES), rng.randint(150, 900))
+                               for d in dates for _ in range(meals_per_day)))
+        db.add_workouts(user_id, ((d, rng.choice(WORKOUT_NAMES), rng.randint(10, 90), rng.randint(50, 600))
+                                  for d in dates for _ in range(workouts_per_day)))
+        weight = 200.0
+        for d in dates[::7]:
+            weight -= rng.uniform(-0.5, 1.5)
+            db.add_weight(user_id, d, round(weight, 1))
+    db.close_conn()
+    return user_ids
+
+
+# -----------------------------
+#   SCENARIOS
+# -----------------------------
+
+def scenarios(days, rng):
+    """(name, method, path, json body) generators for each endpoint."""
+    def any_date():
+        return (START_DATE + timedelta(days=rng.randrange(days))).isoformat()
+
+    return {
+        "survey": lambda: ("POST", "/api/survey", PROFILE),
+        "add_meal": lambda: ("POST", "/api/add-meal",
+                             {"date": any_date(), "description": rng.choice(MEAL_NAMES), "calories": 400}),
+        "daily_summary": lambda: ("GET", f"/api/daily-summary/{any_date()}", None),
+        "complete_day": lambda: ("POST", "/api/complete-day", {"date": any_date()}),
+        "weights": lambda: ("GET", "/api/weights", None),
+    }
+
+
+def session_cookie(flask_app, user_id):
+    """Session cookie for a seeded user, signed with the app's SECRET_KEY (valid for both drivers)."""
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    return serializer.dumps({"user_id": user_id, "_permanent": True})
+
+
+# -----------------------------
+#   DRIVERS
+# -----------------------------
+
+def run_test_client(user_ids, plan, requests_per_scenario):
+    """Issue requests in-process through the Flask test client."""
+    import app as app_module
+    flask_app = app_module.app
+    cookies = {uid: session_cookie(flask_app, uid) for uid in user_ids}
+    client = flask_app.test_client()
+    cookie_name = flask_app.config['SESSION_COOKIE_NAME']
+
+    results = {}
+    for name, make_request in plan.items():
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for i in range(requests_per_scenario):
+            uid = user_ids[i % len(user_ids)]
+            client.set_cookie(cookie_name, cookies[uid])
+            method, path, body = make_request()
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            latencies.append(time.perf_counter() - t0)
+            errors += response.status_code >= 400
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+    return results
+
+
+def run_http(base_port, user_ids, plan, requests_per_scenario, concurrency, db_path, workers, worker_class):
+    """Start a local gunicorn on the seeded DB and drive it over HTTP."""
+    import app as app_module
+    cookie_name = app_module.app.config['SESSION_COOKIE_NAME']
+    cookies = {uid: session_cookie(app_module.app, uid) for uid in user_ids}
+
+    env = dict(os.environ, FITNESS_DB_PATH=str(db_path), PORT=str(base_port), WEB_CONCURRENCY=str(workers))
+    target = 'asgi:app' if worker_class.startswith('uvicorn') else 'app:app'
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', target, '-k', worker_class, '--log-level', 'warning'],
+                              cwd=Path(__file__).parent, env=env)
+    try:
+        _wait_for_port(base_port)
+        results = {}
+        for name, make_request in plan.items():
+            latencies, errors = [], [0]
+            lock = threading.Lock()
+            counter = iter(range(requests_per_scenario))
+
+            def worker():
+                conn = http.client.HTTPConnection('127.0.0.1', base_port, timeout=30)
+                local = []
+                local_errors = 0
+                for i in counter:
+                    uid = user_ids[i % len(user_ids)]
+                    method, path, body = make_request()
+                    headers = {'Cookie': f'{cookie_name}={cookies[uid]}'}
+                    payload = None
+                    if body is not None:
+                        payload = json.dumps(body)
+                        headers['Content-Type'] = 'application/json'
+                    t0 = time.perf_counter()
+                    conn.request(method, path, body=payload, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    local.append(time.perf_counter() - t0)
+                    local_errors += response.status >= 400
+                conn.close()
+                with lock:
+                    latencies.extend(local)
+                    errors[0] += local_errors
+
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            results[name] = summarize(latencies, errors[0], time.perf_counter() - started)
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _wait_for_port(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/weights')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+# -----------------------------
+#   REPORTING
+# -----------------------------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """List endpoints that got slower or lost throughput beyond tolerance."""
+    regressions = []
+    for name, current in results["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if before[metric] and current[metric] > before[metric] * (1 + tolerance):
+                regressions.append({"endpoint": name, "metric": metric,
+                                    "baseline": before[metric], "current": current[metric]})
+        if before["throughput_rps"] and current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append({"endpoint": name, "metric": "throughput_rps",
+                                "baseline": before["throughput_rps"], "current": current["throughput_rps"]})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the fitness tracker API")
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--meals-per-day', type=int, default=4)
+    parser.add_argument('--workouts-per-day', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=500, help="requests per endpoint")
+    parser.add_argument('--driver', choices=['test-client', 'gunicorn'], default='test-client')
+    parser.add_argument('--concurrency', type=int, default=8, help="client threads (gunicorn driver)")
+    parser.add_argument('--workers', type=int, default=1, help="gunicorn worker processes")
+    parser.add_argument('--worker-class', default='gthread', help="gunicorn -k value, e.g. uvicorn.workers.UvicornWorker")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--db', help="reuse/seed this database file instead of a temporary one")
+    parser.add_argument('--seed', type=int, default=42, help="random seed")
+    parser.add_argument('--out', help="write results JSON here (default stdout)")
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    # Keep background jobs out of the measurements
+    os.environ.setdefault('SCHEDULER_ENABLED', '0')
+    # A key of our own, shared with the gunicorn we start, so we can sign
+    # session cookies for the seeded users
+    os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+    rng = random.Random(args.seed)
+    db_path = Path(args.db) if args.db else Path(tempfile.mkdtemp(prefix='fitness-bench-')) / 'bench.db'
+
+    t0 = time.perf_counter()
+    user_ids = seed(db_path, args.users, args.days, args.meals_per_day, args.workouts_per_day, rng)
+    seed_seconds = time.perf_counter() - t0
+
+    plan = scenarios(args.days, rng)
+    if args.driver == 'test-client':
+        endpoints = run_test_client(user_ids, plan, args.requests)
+    else:
+        endpoints = run_http(args.port, user_ids, plan, args.requests, args.concurrency, db_path,
+                             args.workers, args.worker_class)
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ('out', 'baseline')},
+        "seed_seconds": round(seed_seconds, 3),
+        "endpoints": endpoints,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["regressions"] = compare(results, json.load(f), args.tolerance)
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        Path(args.out).write_text(output + "\n")
+    else:
+        print(output)
+    return 1 if results.get("regressions") else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+# Program Name: build_assets.py
+#
+# Description:
+#   Builds the front end into dist/ for production. It:
+#       - Moves the inline <script> blocks of index.html into their own
+#         files
+#       - Minifies the JavaScript, the stylesheets and the pages
+#       - Names every script and stylesheet after a hash of its content
+#         (app.3f9c1a2b.js) and records them in dist/manifest.json
+#       - Writes .gz and .br variants next to each file so nothing is
+#         compressed at request time (brotli comes from requirements.txt;
+#         a local build without it only skips the .br files)
+#   assets.py serves the result; without dist/ the app serves the sources.
+#
+# Usage:
+#   python build_assets.py          # render.yaml runs this on every deploy
+#
+# The sources are never modified. The minifiers are deliberately cautious:
+# JavaScript keeps its line breaks (so automatic semicolon insertion works
+# exactly as before) and strings, template literals and regex literals are
+# copied untouched.
+
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # in requirements.txt; without it .br variants are skipped
+    brotli = None
+
+ROOT = Path(__file__).parent
+DIST = ROOT / 'dist'
+ASSET_URL = '/assets/'
+
+# page -> base name of the script extracted from it. Only pages a route
+# actually serves belong here (templates/ is not rendered by any route)
+PAGES = {
+    'index.html': 'app',
+}
+STYLESHEETS = ['static/style.css']
+HASH_LENGTH = 10
+# Smaller files are not worth a compressed variant
+COMPRESS_MIN_BYTES = 256
+
+
+# -----------------------------
+#   MINIFIERS
+# -----------------------------
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};:,>])\s*', r'\1', css)
+    css = css.replace(';}', '}')
+    return css.strip() + '\n'
+
+
+_WORD = re.compile(r'[\w$]')
+# A "/" after one of these (or after these keywords) starts a regex literal
+_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'delete', 'throw')
+# Line breaks after these never end a statement, so they can go
+_JOINS_NEXT_LINE = set('{;,([:=&|?!<>*%')
+# A space next to these is never needed (+, - and / are left alone)
+_NO_SPACE = set('{}()[];,:=<>?!&|*%^~')
+
+
+def minify_js(source):
+    """Strip comments and collapse whitespace, leaving literals untouched."""
+    out = []
+    i, n = 0, len(source)
+    # Each entry is the brace depth of an open ${...} inside a template literal
+    templates = []
+
+    def last_significant():
+        for chunk in reversed(out):
+            stripped = chunk.rstrip()
+            if stripped:
+                return stripped
+        return ''
+
+    def regex_allowed():
+        prev = last_significant()
+        if not prev:
+            return True
+        if prev[-1] in _REGEX_AFTER:
+            return True
+        word = re.search(r'[\w$]+$', prev)
+        return bool(word) and word.group() in _REGEX_KEYWORDS
+
+    def copy_string(start, quote):
+        j = start + 1
+        while j < n and source[j] != quote:
+            j += 2 if source[j] == '\\' else 1
+        return j + 1
+
+    def copy_template_chunk(start):
+        """From inside a template literal, return the index after its end or its next '${'."""
+        j = start
+        while j < n:
+            if source[j] == '\\':
+                j += 2
+            elif source[j] == '`':
+                return j + 1, False
+            elif source.startswith('${', j):
+                return j + 2, True
+            else:
+                j += 1
+        return j, False
+
+    def copy_regex(start):
+        j, in_class = start + 1, False
+        while j < n:
+            c = source[j]
+            if c == '\\':
+                j += 2
+                continue
+            if c == '[':
+                in_class = True
+            elif c == ']':
+                in_class = False
+            elif c == '/' and not in_class:
+                j += 1
+                break
+            j += 1
+        while j < n and _WORD.match(source[j]):
+            j += 1
+        return j
+
+    while i < n:
+        c = source[i]
+        if c in '"\'':
+            end = copy_string(i, c)
+            out.append(source[i:end])
+            i = end
+        elif c == '`':
+            end, opened = copy_template_chunk(i + 1)
+            out.append(source[i:end])
+            if opened:
+                templates.append(0)
+            i = end
+        elif c == '{' and templates:
+            templates[-1] += 1
+            out.append(c)
+            i += 1
+        elif c == '}' and templates:
+            if templates[-1] == 0:
+                # Back inside the template literal
+                templates.pop()
+                end, opened = copy_template_chunk(i + 1)
+                out.append(source[i:end])
+                if opened:
+                    templates.append(0)
+                i = end
+            else:
+                templates[-1] -= 1
+                out.append(c)
+                i += 1
+        elif source.startswith('//', i):
+            while i < n and source[i] != '\n':
+                i += 1
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            out.append(' ')
+        elif c == '/' and regex_allowed():
+            end = copy_regex(i)
+            out.append(source[i:end])
+            i = end
+        elif c.isspace():
+            j = i
+            while j < n and source[j].isspace():
+                j += 1
+            out.append('\n' if '\n' in source[i:j] else ' ')
+            i = j
+        else:
+            out.append(c)
+            i += 1
+
+    # Second pass: decide which of the whitespace markers (chunks that are
+    # exactly ' ' or '\n'; literals always carry their quotes) are needed
+    result = []
+    pending = None
+    for chunk in out:
+        if chunk in (' ', '\n'):
+            if pending != '\n':
+                pending = chunk
+            continue
+        if pending and result:
+            prev, nxt = result[-1][-1], chunk[0]
+            if pending == '\n':
+                if prev not in _JOINS_NEXT_LINE:
+                    result.append('\n')
+            elif not (prev in _NO_SPACE or nxt in _NO_SPACE):
+                result.append(' ')
+        pending = None
+        result.append(chunk)
+    return ''.join(result).strip() + '\n'
+
+
+def minify_html(html):
+    if '<pre' in html or '<textarea' in html:
+        return html
+    html = re.sub(r'<!--(?!\[).*?-->', '', html, flags=re.DOTALL)
+    lines = (line.strip() for line in html.splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+# -----------------------------
+#   BUILD
+# -----------------------------
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def write_asset(out_dir, manifest, logical_name, text):
+    """Write a hashed asset and record it in the manifest; returns its URL."""
+    data = text.encode('utf-8')
+    stem, ext = logical_name.rsplit('.', 1)
+    hashed = f'{stem}.{content_hash(data)}.{ext}'
+    (out_dir / hashed).write_bytes(data)
+    manifest[logical_name] = hashed
+    return ASSET_URL + hashed
+
+
+_STYLESHEET_HREF = re.compile(r'href="/?static/([^"]+)"')
+_INLINE_SCRIPT = re.compile(r'<script>(.*?)</script>', re.DOTALL)
+
+
+def build_page(source, script_name, out_dir, manifest):
+    html = source.read_text(encoding='utf-8')
+
+    def stylesheet(match):
+        name = match.group(1)
+        return f'href="{ASSET_URL}{manifest[name]}"' if name in manifest else match.group(0)
+
+    html = _STYLESHEET_HREF.sub(stylesheet, html)
+
+    blocks = []
+
+    def script(match):
+        body = match.group(1)
+        blocks.append(body)
+        suffix = f'-{len(blocks)}' if len(blocks) > 1 else ''
+        url = write_asset(out_dir, manifest, f'{script_name}{suffix}.js', minify_js(body))
+        return f'<script src="{url}"></script>'
+
+    html = _INLINE_SCRIPT.sub(script, html)
+    target = out_dir / source.relative_to(ROOT)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(minify_html(html), encoding='utf-8')
+
+
+def compress_all(out_dir):
+    for path in sorted(out_dir.rglob('*')):
+        if not path.is_file() or path.suffix in ('.gz', '.br', '.json'):
+            continue
+        data = path.read_bytes()
+        if len(data) < COMPRESS_MIN_BYTES:
+            continue
+        # mtime=0 keeps the .gz bytes identical between builds
+        path.with_name(path.name + '.gz').write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            path.with_name(path.name + '.br').write_bytes(brotli.compress(data, quality=11))
+
+
+def build(dist=DIST):
+    """Build everything into a fresh directory, then swap it in place of dist."""
+    staging = dist.with_name(dist.name + '.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    manifest = {}
+    for name in STYLESHEETS:
+        source = ROOT / name
+        write_asset(staging, manifest, source.name, minify_css(source.read_text(encoding='utf-8')))
+    for page, script_name in PAGES.items():
+        build_page(ROOT / page, script_name, staging, manifest)
+    (staging / 'manifest.json').write_text(json.dumps(manifest, indent=2, sort_keys=True) + '\n')
+    compress_all(staging)
+
+    shutil.rmtree(dist, ignore_errors=True)
+    staging.rename(dist)
+    return manifest
+
+
+def report(dist=DIST):
+    """Bytes per built file: source-equivalent, gzip and brotli."""
+    lines = []
+    for path in sorted(dist.rglob('*')):
+        if path.is_file() and path.suffix not in ('.gz', '.br'):
+            sizes = [path.stat().st_size]
+            for suffix in ('.gz', '.br'):
+                variant = path.with_name(path.name + suffix)
+                sizes.append(variant.stat().st_size if variant.exists() else None)
+            lines.append(f'{str(path.relative_to(dist)):45} {sizes[0]:>8} gz={sizes[1]} br={sizes[2]}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    build()
+    print(report())
+    sys.exit(0)
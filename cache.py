@@ -0,0 +1,166 @@
+"""Read cache for per-user, per-date API data.
+
+Entries are grouped by (user, scope): a scope is a date ("2025-12-01") or a
+named data set such as "weights". Each group holds the results of the
+different reads over that scope (meal list, workout list, summary, ...), so
+a write only has to drop the one group it touched.
+
+The default backend is a bounded in-process LRU. Anything with get, set,
+delete and clear (for example a thin Redis wrapper) can be plugged in with
+configure() to share the cache between workers; values are plain dicts and
+lists so they serialize as JSON. db reads through the cache with the
+scope's data version in the part name, so writes made by other processes
+are never served stale, they only leave entries behind that nothing reads
+again (a shared backend avoids that waste across several workers).
+CACHE_MAX_ENTRIES=0 turns the cache off.
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 2048))
+
+
+class LRUBackend:
+    """Thread-safe in-process store that evicts the least recently used group."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache:
+    def __init__(self, backend=None, enabled=True):
+        self.backend = backend if backend is not None else LRUBackend()
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def _epoch(self, user_id):
+        # Bumped by invalidate_user() so every group of that user goes stale
+        # at once without having to enumerate them
+        return self.backend.get(f'epoch:{user_id}') or '0'
+
+    def _key(self, user_id, scope):
+        return f'{user_id}:{self._epoch(user_id)}:{scope}'
+
+    def get_or_compute(self, user_id, scope, part, compute):
+        """Return the cached result of one read, computing it on a miss.
+
+        A group carries a token that changes whenever the group is
+        invalidated; a result computed while a write landed is only stored
+        if the token is still the same, so a slow read cannot re-cache data
+        the write just replaced.
+        """
+        if not self.enabled or user_id is None:
+            return compute()
+        key = self._key(user_id, scope)
+        group = self.backend.get(key)
+        if group is not None and part in group['parts']:
+            self.hits += 1
+            return group['parts'][part]
+        self.misses += 1
+        if group is None:
+            group = {'token': uuid.uuid4().hex, 'parts': {}}
+            self.backend.set(key, group)
+        token = group['token']
+        value = compute()
+        with self._lock:
+            current = self.backend.get(key)
+            if current is not None and current['token'] == token:
+                current['parts'][part] = value
+                self.backend.set(key, current)
+        return value
+
+    def get(self, user_id, scope, part):
+        """Cached value of one read, or None (no compute on a miss)."""
+        if not self.enabled or user_id is None:
+            return None
+        group = self.backend.get(self._key(user_id, scope))
+        return group['parts'].get(part) if group is not None else None
+
+    def put(self, user_id, scope, part, value):
+        """Store a value computed outside get_or_compute (e.g. updated state)."""
+        if not self.enabled or user_id is None:
+            return
+        key = self._key(user_id, scope)
+        with self._lock:
+            group = self.backend.get(key) or {'token': uuid.uuid4().hex, 'parts': {}}
+            group['parts'][part] = value
+            self.backend.set(key, group)
+
+    def invalidate(self, user_id, scope):
+        """Drop every cached read of one (user, scope) group."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.backend.set(self._key(user_id, scope), {'token': uuid.uuid4().hex, 'parts': {}})
+        self.invalidations += 1
+
+    def invalidate_user(self, user_id):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.backend.set(f'epoch:{user_id}', uuid.uuid4().hex)
+        self.invalidations += 1
+
+    def clear(self):
+        self.backend.clear()
+        self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+        if hasattr(self.backend, '__len__'):
+            stats["entries"] = len(self.backend)
+        return stats
+
+
+response_cache = ResponseCache(enabled=CACHE_MAX_ENTRIES > 0)
+
+
+def configure(backend=None, enabled=True):
+    """Swap the cache backend (e.g. a shared store, or a stub in tests)."""
+    global response_cache
+    response_cache = ResponseCache(backend, enabled=enabled)
+    return response_cache
+
+
+def get_cache():
+    return response_cache
@@ -1,19 +1,212 @@
 import sqlite3
 import json
+import os
+import re
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 
-DB_PATH = Path(__file__).parent / 'data.db'
+import cache
+import metrics
+import writer
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+DB_PATH = Path(os.environ.get('FITNESS_DB_PATH', Path(__file__).parent / 'data.db'))
+
+# Connection tuning. WAL lets readers run alongside the single writer, and
+# synchronous=NORMAL is durable across application crashes in WAL mode.
+BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16384))
+MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 64 * 1024 * 1024))
+
+# One reusable connection per thread (gunicorn sync/gthread workers each get
+# their own), dropped automatically if the process forks.
+_local = threading.local()
+# Handles inherited from a parent process. Closing one in the child can
+# release the parent's locks, so they are kept referenced and never used.
+_inherited = []
+
+
+def _open_conn():
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                           check_same_thread=False, factory=metrics.connection_factory())
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA foreign_keys=ON')
     return conn
 
+
+def get_conn():
+    """Return this thread's connection, opening it on first use.
+
+    The connection is in autocommit mode; use connection() to group
+    statements into a transaction.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and (_local.pid != os.getpid() or _local.path != str(DB_PATH)):
+        # Inherited across fork or DB_PATH changed: never reuse the handle.
+        if _local.pid != os.getpid():
+            _inherited.append(conn)
+        conn = None
+    if conn is None:
+        conn = _open_conn()
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.path = str(DB_PATH)
+        _local.depth = 0
+        _local.on_commit = []
+    return conn
+
+
+@contextmanager
+def connection(write=False):
+    """Run a block of statements in one transaction on the thread's connection.
+
+    Nested blocks join the outermost transaction. Writers take the lock up
+    front (BEGIN IMMEDIATE) so busy_timeout applies instead of failing on a
+    read-to-write lock upgrade.
+    """
+    conn = get_conn()
+    if _local.depth == 0:
+        conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+    _local.depth += 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth -= 1
+        if _local.depth == 0:
+            _local.on_commit = []
+            if conn.in_transaction:
+                conn.rollback()
+        raise
+    else:
+        _local.depth -= 1
+        if _local.depth == 0:
+            conn.commit()
+            callbacks, _local.on_commit = _local.on_commit, []
+            for callback in callbacks:
+                callback()
+
+
+def after_commit(callback):
+    """Run callback once the current transaction commits (now if none is open).
+
+    Used to invalidate cached reads only after the new data is visible to
+    other connections; a rolled back transaction drops its callbacks.
+    """
+    if getattr(_local, 'depth', 0) == 0:
+        callback()
+    else:
+        _local.on_commit.append(callback)
+
+
+# Single-entry writes go through _write(), which hands them to the group
+# committer when GROUP_COMMIT_WINDOW_MS is set (see writer.py) and otherwise
+# runs them directly. Calls made inside an open transaction always run
+# directly so they stay part of it.
+writer.configure(partial(connection, write=True))
+
+
+def _write(fn, *args):
+    group = writer.get_writer()
+    if group is None or getattr(_local, 'depth', 0):
+        return fn(*args)
+    return group.call(fn, *args)
+
+
+def _invalidate(user_id, *scopes):
+    def run():
+        response_cache = cache.get_cache()
+        for scope in scopes:
+            response_cache.invalidate(user_id, scope)
+    after_commit(run)
+
+
+def _touch(conn, user_id, *scopes):
+    """Mark scopes (dates or "weights") of a user as changed.
+
+    Bumps their data_versions rows in the caller's transaction, so the
+    version moves exactly when the data does, and drops the cached reads
+    once it commits.
+    """
+    conn.executemany('''
+    INSERT INTO data_versions (user_id, scope, version) VALUES (?, ?, 1)
+    ON CONFLICT (user_id, scope) DO UPDATE SET version = version + 1
+    ''', ((user_id, scope) for scope in scopes))
+    _invalidate(user_id, *scopes)
+
+
+def _cached(user_id, scope, part, compute):
+    """Read through the response cache, keyed by the scope's data version.
+
+    The after-commit invalidation runs a moment after the new version is
+    visible, and never reaches this process for writes made elsewhere
+    (fitness_cli.py, a standalone scheduler). With the version in the key
+    a reader that sees a write never gets a body cached before it, so a
+    fresh ETag (etags.conditional) never goes out with stale data; the
+    invalidation only frees the old entries.
+    """
+    version = get_version(user_id, scope) if user_id is not None else 0
+    return cache.get_cache().get_or_compute(user_id, scope, f'{part}@{version}', compute)
+
+
+def release_conn(exc=None):
+    """End-of-request hook: roll back anything a failed request left open."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    _local.depth = 0
+    _local.on_commit = []
+
+
+def close_conn():
+    """Close this thread's connection (worker shutdown, tests)."""
+    conn = getattr(_local, 'conn', None)
+    _local.conn = None
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+
+
+def init_app(app):
+    """Share the thread's connection across a request and clean up after it."""
+    app.teardown_request(release_conn)
+
+
 def init_db():
+    """Create or upgrade the schema; returns the version the database was at.
+
+    A database already at SCHEMA_VERSION (every boot after the first) only
+    has its user_version read: no write lock, no DDL. The connection is
+    closed afterwards so no handle opened at import time is carried into
+    forked workers (gunicorn preload_app).
+    """
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = get_conn()
-    cur = conn.cursor()
+    try:
+        version = schema_version()
+        if version < SCHEMA_VERSION:
+            with connection(write=True) as conn:
+                _create_tables(conn.cursor())
+                # Re-read under the write lock, another worker may have won
+                version = _migrate(conn)
+        return version
+    finally:
+        close_conn()
+
+
+def schema_version():
+    return get_conn().execute('PRAGMA user_version').fetchone()[0]
+
+
+def _create_tables(cur):
 
     cur.execute('''
     CREATE TABLE IF NOT EXISTS meals (
@@ -56,113 +249,993 @@ def init_db():
     )
     ''')
 
-    conn.commit()
-    conn.close()
 
-# Meals
-def add_meal(date, description, calories):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute('INSERT INTO meals (date, description, calories) VALUES (?,?,?)', (date, description, calories))
-    conn.commit()
-    rowid = cur.lastrowid
-    conn.close()
-    return rowid
+# Schema migrations. Each entry upgrades the schema by one version; the
+# current version is kept in PRAGMA user_version so startup only runs the
+# steps a database has not seen yet. Append new steps, never edit old ones.
+def _migration_1_indexes(cur):
+    # Older databases may hold several rows per week; keep the newest one
+    cur.execute('''
+    DELETE FROM weights WHERE id NOT IN (SELECT MAX(id) FROM weights GROUP BY week)
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_meals_date ON meals (date, id, description, calories)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_workouts_date ON workouts (date, id, name, duration, calories)')
+    cur.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_weights_week ON weights (week)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_completed_days_date ON completed_days (date, id DESC)')
 
-def get_meals_for_date(date):
-    conn = get_conn()
+
+def _migration_2_users(cur):
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT DEFAULT (datetime('now')),
+        legacy INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cur.execute('CREATE INDEX idx_users_legacy ON users (id) WHERE legacy = 1')
+    # Rows written before users existed belong to one shared "legacy" user,
+    # handed to the first session that needs a user (claim_legacy_user)
+    tables = ('meals', 'workouts', 'weights', 'completed_days')
+    legacy_id = 0
+    if any(cur.execute(f'SELECT 1 FROM {t} LIMIT 1').fetchone() for t in tables):
+        legacy_id = cur.execute('INSERT INTO users (legacy) VALUES (1)').lastrowid
+    for table in tables:
+        cur.execute(f'ALTER TABLE {table} ADD COLUMN user_id INTEGER NOT NULL DEFAULT 0')
+        if legacy_id:
+            cur.execute(f'UPDATE {table} SET user_id = ?', (legacy_id,))
+    cur.execute('DROP INDEX IF EXISTS idx_meals_date')
+    cur.execute('DROP INDEX IF EXISTS idx_workouts_date')
+    cur.execute('DROP INDEX IF EXISTS idx_weights_week')
+    cur.execute('DROP INDEX IF EXISTS idx_completed_days_date')
+    cur.execute('CREATE INDEX idx_meals_user_date ON meals (user_id, date, id, description, calories)')
+    cur.execute('CREATE INDEX idx_workouts_user_date ON workouts (user_id, date, id, name, duration, calories)')
+    cur.execute('CREATE UNIQUE INDEX idx_weights_user_week ON weights (user_id, week)')
+    cur.execute('CREATE INDEX idx_completed_days_user_date ON completed_days (user_id, date, id DESC)')
+
+
+def _migration_3_daily_totals(cur):
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS daily_totals (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        calories_eaten REAL NOT NULL DEFAULT 0,
+        calories_burned REAL NOT NULL DEFAULT 0,
+        meal_count INTEGER NOT NULL DEFAULT 0,
+        workout_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, date)
+    ) WITHOUT ROWID
+    ''')
+    cur.execute('''
+    INSERT INTO daily_totals (user_id, date, calories_eaten, calories_burned, meal_count, workout_count)
+    SELECT user_id, date, TOTAL(eaten), TOTAL(burned), SUM(is_meal), SUM(1 - is_meal)
+    FROM (
+        SELECT user_id, date, calories AS eaten, 0 AS burned, 1 AS is_meal FROM meals
+        UNION ALL
+        SELECT user_id, date, 0 AS eaten, calories AS burned, 0 AS is_meal FROM workouts
+    )
+    GROUP BY user_id, date
+    ''')
+
+
+def _migration_4_completed_days_key(cur):
+    # Rebuild keyed by (user_id, date), keeping only the latest snapshot of
+    # each day that repeated completions appended
+    cur.execute('''
+    CREATE TABLE completed_days_new (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        calories_eaten REAL,
+        calories_burned REAL,
+        net_calories REAL,
+        daily_goal REAL,
+        percent_reached INTEGER,
+        created_at TEXT DEFAULT (datetime('now')),
+        updated_at TEXT DEFAULT (datetime('now')),
+        PRIMARY KEY (user_id, date)
+    ) WITHOUT ROWID
+    ''')
+    cur.execute('''
+    INSERT INTO completed_days_new (user_id, date, calories_eaten, calories_burned, net_calories,
+                                    daily_goal, percent_reached, created_at, updated_at)
+    SELECT c.user_id, c.date, c.calories_eaten, c.calories_burned, c.net_calories,
+           c.daily_goal, c.percent_reached, first.created_at, c.created_at
+    FROM completed_days c
+    JOIN (SELECT user_id, date, MAX(id) AS last_id, MIN(created_at) AS created_at
+          FROM completed_days GROUP BY user_id, date) first
+      ON c.id = first.last_id
+    ''')
+    cur.execute('DROP TABLE completed_days')
+    cur.execute('ALTER TABLE completed_days_new RENAME TO completed_days')
+
+
+def _migration_5_weights_by_date(cur):
+    cur.execute('CREATE INDEX idx_weights_user_date ON weights (user_id, date, week, weight)')
+
+
+def _migration_6_data_versions(cur):
+    # Change counter per user and scope (a date, or "weights"), used as the
+    # validator for HTTP conditional requests
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        user_id INTEGER NOT NULL,
+        scope TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, scope)
+    ) WITHOUT ROWID
+    ''')
+
+
+def _migration_7_change_log(cur):
+    for table in ('meals', 'workouts'):
+        cur.execute(f'ALTER TABLE {table} ADD COLUMN client_id TEXT')
+        cur.execute(f'CREATE UNIQUE INDEX idx_{table}_client ON {table} (user_id, client_id) WHERE client_id IS NOT NULL')
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        entity TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        created_at TEXT DEFAULT (datetime('now'))
+    )
+    ''')
+    cur.execute('CREATE INDEX idx_change_log_user ON change_log (user_id, seq)')
+    # Seed the log with existing history so a client's first sync pulls it
+    for entity, (table, payload) in CHANGE_PROJECTIONS.items():
+        cur.execute(f'''INSERT INTO change_log (user_id, entity, payload)
+                       SELECT user_id, '{entity}', {payload} FROM {table} ORDER BY date, id''')
+
+
+def _migration_8_profiles(cur):
+    # One row per survey; a goal applies from its effective_from date until
+    # the next one, so older days keep the goal they were logged against
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS profiles (
+        user_id INTEGER NOT NULL,
+        effective_from TEXT NOT NULL,
+        age INTEGER NOT NULL,
+        current_weight REAL NOT NULL,
+        goal_weight REAL NOT NULL,
+        weeks REAL NOT NULL,
+        daily_calorie_goal REAL NOT NULL,
+        created_at TEXT DEFAULT (datetime('now')),
+        PRIMARY KEY (user_id, effective_from)
+    ) WITHOUT ROWID
+    ''')
+
+
+def _migration_9_entry_search(cur):
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS entry_names (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        text TEXT NOT NULL COLLATE NOCASE,
+        uses INTEGER NOT NULL DEFAULT 0,
+        total_calories REAL NOT NULL DEFAULT 0,
+        total_duration REAL,
+        last_date TEXT,
+        UNIQUE (user_id, kind, text)
+    )
+    ''')
+    # Contentless: the names themselves live in entry_names, the index only
+    # maps tokens to its rowids. Triggers keep the two in step.
+    cur.execute("CREATE VIRTUAL TABLE entry_search USING fts5(scope, text, content='', prefix='2 3')")
+    cur.execute('''
+    CREATE TRIGGER entry_names_ai AFTER INSERT ON entry_names BEGIN
+        INSERT INTO entry_search (rowid, scope, text) VALUES (new.id, 'u' || new.user_id || new.kind, new.text);
+    END
+    ''')
+    cur.execute('''
+    CREATE TRIGGER entry_names_ad AFTER DELETE ON entry_names BEGIN
+        INSERT INTO entry_search (entry_search, rowid, scope, text)
+        VALUES ('delete', old.id, 'u' || old.user_id || old.kind, old.text);
+    END
+    ''')
+    for kind in ENTRY_TABLES:
+        _index_entry_names(cur, kind, '1', ())
+
+
+def _migration_10_daily_totals_by_date(cur):
+    # Lets the day finalizer find the days that became past since its last run
+    cur.execute('CREATE INDEX idx_daily_totals_date ON daily_totals (date)')
+
+
+MIGRATIONS = [
+    _migration_1_indexes,
+    _migration_2_users,
+    _migration_3_daily_totals,
+    _migration_4_completed_days_key,
+    _migration_5_weights_by_date,
+    _migration_6_data_versions,
+    _migration_7_change_log,
+    _migration_8_profiles,
+    _migration_9_entry_search,
+    _migration_10_daily_totals_by_date,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _migrate(conn):
     cur = conn.cursor()
-    cur.execute('SELECT description, calories FROM meals WHERE date = ? ORDER BY id', (date,))
-    rows = cur.fetchall()
-    conn.close()
+    version = cur.execute('PRAGMA user_version').fetchone()[0]
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        step(cur)
+        cur.execute(f'PRAGMA user_version = {number}')
+    return version
+
+
+USER_TABLES = ('meals', 'workouts', 'weights', 'completed_days', 'daily_totals', 'data_versions', 'change_log',
+               'profiles', 'entry_names')
+
+
+# Users
+def create_user():
+    with connection(write=True) as conn:
+        return conn.execute('INSERT INTO users DEFAULT VALUES').lastrowid
+
+# Database paths this process has seen without a legacy user left to claim
+_legacy_claimed = set()
+
+def claim_legacy_user():
+    """Take over the data logged before there were users, once.
+
+    Returns the legacy user's id to the first caller (across all processes:
+    the flag is cleared in a single UPDATE) and None from then on, or when
+    the database never had pre-user data.
+    """
+    if str(DB_PATH) in _legacy_claimed:
+        return None
+    with connection(write=True) as conn:
+        row = conn.execute('UPDATE users SET legacy = 0 WHERE legacy = 1 RETURNING id').fetchone()
+    if row is None:
+        _legacy_claimed.add(str(DB_PATH))
+        return None
+    return row[0]
+
+def user_exists(user_id):
+    with connection() as conn:
+        return conn.execute('SELECT 1 FROM users WHERE id = ?', (user_id,)).fetchone() is not None
+
+def list_users():
+    """Every user with how many days they logged and their latest day."""
+    with connection() as conn:
+        rows = conn.execute('''
+        SELECT u.id, u.created_at, u.legacy, COUNT(t.date) AS days_logged, MAX(t.date) AS last_date
+        FROM users u LEFT JOIN daily_totals t
+            ON t.user_id = u.id AND (t.meal_count > 0 OR t.workout_count > 0)
+        GROUP BY u.id ORDER BY u.id
+        ''').fetchall()
+    return [dict(r) for r in rows]
+
+def clear_user_data(user_id):
+    """Delete everything stored for one user (profile reset).
+
+    Each delete is served by the table's (user_id, ...) index, so other
+    users' rows and concurrent writers are not affected.
+    """
+    with connection(write=True) as conn:
+        for table in USER_TABLES:
+            conn.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
+        conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        after_commit(lambda: cache.get_cache().invalidate_user(user_id))
+    return True
+
+
+# Profiles
+PROFILE_FIELDS = ('age', 'current_weight', 'goal_weight', 'weeks', 'daily_calorie_goal')
+
+def save_profile(user_id, profile, effective_from):
+    """Store a survey result as the user's goal from effective_from on.
+
+    Submitting twice for the same date replaces that date's entry.
+    """
+    with connection(write=True) as conn:
+        conn.execute(f'''
+        INSERT INTO profiles (user_id, effective_from, {', '.join(PROFILE_FIELDS)})
+        VALUES (?, ?, {', '.join('?' * len(PROFILE_FIELDS))})
+        ON CONFLICT (user_id, effective_from) DO UPDATE SET
+            {', '.join(f'{f} = excluded.{f}' for f in PROFILE_FIELDS)},
+            created_at = datetime('now')
+        ''', (user_id, effective_from, *(profile[f] for f in PROFILE_FIELDS)))
+        _touch(conn, user_id, 'profile', 'trends')
+
+def get_profile_history(user_id):
+    """All of a user's profiles, oldest effective_from first (cached)."""
+    def compute():
+        with connection() as conn:
+            rows = conn.execute(f'''SELECT effective_from, {', '.join(PROFILE_FIELDS)} FROM profiles
+                                    WHERE user_id = ? ORDER BY effective_from''', (user_id,)).fetchall()
+        return [dict(r) for r in rows]
+    return _cached(user_id, 'profile', 'history', compute)
+
+def get_profile(user_id):
+    """The user's latest profile, or None before the first survey."""
+    history = get_profile_history(user_id)
+    return history[-1] if history else None
+
+def goal_for_date(user_id, date):
+    """Daily calorie goal that applied on date (0 without a profile).
+
+    Days before the first survey use the first goal. The history is
+    cached, so this is a bisect over a short list rather than a query.
+    """
+    history = get_profile_history(user_id)
+    if not history:
+        return 0
+    index = bisect_right([p['effective_from'] for p in history], date) - 1
+    return history[max(index, 0)]['daily_calorie_goal']
+
+
+def get_version(user_id, scope):
+    """Current change counter of a user's scope (0 if never written)."""
+    row = get_conn().execute('SELECT version FROM data_versions WHERE user_id = ? AND scope = ?',
+                             (user_id, scope)).fetchone()
+    return row[0] if row else 0
+
+
+# Change log. Every write appends the new state of the entries it touched,
+# in commit order, so a client can pull just what changed since the last
+# sequence number it saw (see /api/sync).
+CHANGE_PROJECTIONS = {
+    'meal': ('meals', "json_object('client_id', COALESCE(client_id, 'srv-' || id), 'date', date, "
+                      "'description', description, 'calories', calories)"),
+    'workout': ('workouts', "json_object('client_id', COALESCE(client_id, 'srv-' || id), 'date', date, "
+                            "'name', name, 'duration', duration, 'calories', calories)"),
+    'weight': ('weights', "json_object('week', week, 'date', date, 'weight', weight)"),
+}
+
+def _log_changes(conn, entity, user_id, where, params):
+    table, payload = CHANGE_PROJECTIONS[entity]
+    conn.execute(f'''INSERT INTO change_log (user_id, entity, payload)
+                     SELECT user_id, '{entity}', {payload} FROM {table} WHERE {where} ORDER BY id''', params)
+
+def get_changes(user_id, since=0, limit=500, entity=None):
+    """Return (changes, cursor) for a user's log entries after sequence since.
+
+    entity ("meal", "workout" or "weight") restricts it to one kind.
+    """
+    sql = 'SELECT seq, entity, payload FROM change_log WHERE user_id = ? AND seq > ?'
+    params = [user_id, since]
+    if entity:
+        sql += ' AND entity = ?'
+        params.append(entity)
+    with connection() as conn:
+        rows = conn.execute(sql + ' ORDER BY seq LIMIT ?', params + [limit]).fetchall()
+    changes = [{'seq': r['seq'], 'entity': r['entity'], 'data': json.loads(r['payload'])} for r in rows]
+    return changes, (changes[-1]['seq'] if changes else since)
+
+
+def get_latest_seq(user_id):
+    """Sequence number of the user's most recent change (0 if none)."""
+    row = get_conn().execute('SELECT MAX(seq) FROM change_log WHERE user_id = ?', (user_id,)).fetchone()
+    return row[0] or 0
+
+
+# Daily totals. One row per user and day, adjusted by every write to meals
+# or workouts inside the same transaction, so reads never re-sum raw rows.
+# Edits and deletes pass negative deltas.
+def _adjust_daily_totals(conn, user_id, date, eaten=0, burned=0, meals=0, workouts=0):
+    conn.execute('''
+    INSERT INTO daily_totals (user_id, date, calories_eaten, calories_burned, meal_count, workout_count)
+    VALUES (?,?,?,?,?,?)
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        calories_eaten = calories_eaten + excluded.calories_eaten,
+        calories_burned = calories_burned + excluded.calories_burned,
+        meal_count = meal_count + excluded.meal_count,
+        workout_count = workout_count + excluded.workout_count
+    ''', (user_id, date, eaten, burned, meals, workouts))
+
+def get_day_totals(user_id, date):
+    """Return the precomputed totals for one day (zeros if nothing logged)."""
+    return _cached(user_id, date, 'totals', lambda: _read_day_totals(user_id, date))
+
+def _read_day_totals(user_id, date):
+    with connection() as conn:
+        row = conn.execute('''SELECT calories_eaten, calories_burned, meal_count, workout_count
+                              FROM daily_totals WHERE user_id = ? AND date = ?''', (user_id, date)).fetchone()
+    if not row:
+        return {'calories_eaten': 0, 'calories_burned': 0, 'meal_count': 0, 'workout_count': 0}
+    return dict(row)
+
+
+# Meals and workouts share one write path. ENTRY_TABLES maps an entry kind
+# to its table, its data columns and which daily total it feeds.
+# kind: (table, columns, daily_totals side, free-text column)
+ENTRY_TABLES = {
+    'meal': ('meals', ('date', 'description', 'calories'), 'eaten', 'description'),
+    'workout': ('workouts', ('date', 'name', 'duration', 'calories'), 'burned', 'name'),
+}
+
+def _insert_sql(kind):
+    table, columns, _, _ = ENTRY_TABLES[kind]
+    placeholders = ', '.join('?' * (len(columns) + 2))
+    # client_id makes offline uploads idempotent: a retried entry is skipped
+    return (f'INSERT INTO {table} (user_id, {", ".join(columns)}, client_id) VALUES ({placeholders}) '
+            'ON CONFLICT (user_id, client_id) WHERE client_id IS NOT NULL DO NOTHING')
+
+def _record_new_entries(conn, kind, user_id, after_id):
+    """Fold entries inserted after after_id into daily_totals, the change log and data versions.
+
+    Works from the rows that actually landed, so entries skipped as
+    duplicates are never counted twice.
+    """
+    table, _, side, _ = ENTRY_TABLES[kind]
+    per_day = conn.execute(f'''SELECT date, TOTAL(calories), COUNT(*) FROM {table}
+                              WHERE id > ? AND user_id = ? GROUP BY date''', (after_id, user_id)).fetchall()
+    for date, calories, count in per_day:
+        _adjust_daily_totals(conn, user_id, date, **{side: calories, f'{kind}s': count})
+    _log_changes(conn, kind, user_id, 'id > ? AND user_id = ?', (after_id, user_id))
+    _index_entry_names(conn, kind, 'id > ? AND user_id = ?', (after_id, user_id))
+    _touch(conn, user_id, 'trends', *(row[0] for row in per_day))
+
+def _add_entry(kind, user_id, values, client_id=None):
+    with connection(write=True) as conn:
+        cur = conn.execute(_insert_sql(kind), (user_id,) + tuple(values) + (client_id,))
+        if not cur.rowcount:
+            return None
+        _record_new_entries(conn, kind, user_id, cur.lastrowid - 1)
+        return cur.lastrowid
+
+def _add_entries(kind, user_id, rows):
+    """Insert many entries of one kind in a single transaction.
+
+    rows may be any iterable. It is read to the end before the write lock
+    is taken, so a slow source (a generator over an upload) never keeps
+    other writers waiting; callers feed large inputs in chunks. A row may
+    carry a trailing client_id. Returns the number of rows inserted.
+    """
+    table, columns, _, _ = ENTRY_TABLES[kind]
+    width = len(columns)
+    params = []
+    for r in rows:
+        r = tuple(r)
+        params.append((user_id,) + r[:width] + (r[width] if len(r) > width else None,))
+    if not params:
+        return 0
+
+    with connection(write=True) as conn:
+        # BEGIN IMMEDIATE holds the write lock, so every new id is above this
+        before = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+        cur = conn.executemany(_insert_sql(kind), params)
+        if cur.rowcount:
+            _record_new_entries(conn, kind, user_id, before)
+        return cur.rowcount
+
+
+# Search. entry_names keeps one row per distinct meal description or
+# workout name of a user (case-insensitive) with how often it was logged
+# and its running totals; entry_search is an FTS5 index over those names.
+# Each entry is indexed under a per-user, per-kind scope token, so a
+# lookup only ever touches that user's names.
+SUGGEST_LIMIT = 8
+
+def _search_scope(user_id, kind):
+    return f'u{user_id}{kind}'
+
+def _index_entry_names(conn, kind, where, params):
+    table, _, _, text_column = ENTRY_TABLES[kind]
+    duration = 'TOTAL(duration)' if kind == 'workout' else 'NULL'
+    conn.execute(f'''
+    INSERT INTO entry_names (user_id, kind, text, uses, total_calories, total_duration, last_date)
+    SELECT user_id, '{kind}', MIN({text_column}), COUNT(*), TOTAL(calories), {duration}, MAX(date)
+    FROM {table} WHERE {where}
+    GROUP BY user_id, {text_column} COLLATE NOCASE
+    ON CONFLICT (user_id, kind, text) DO UPDATE SET
+        uses = uses + excluded.uses,
+        total_calories = total_calories + excluded.total_calories,
+        total_duration = total_duration + excluded.total_duration,
+        last_date = MAX(last_date, excluded.last_date)
+    ''', params)
+
+def suggest(user_id, kind, query, limit=SUGGEST_LIMIT):
+    """Names of the user's past entries matching query as a prefix search.
+
+    Every word of query must prefix a word of the name. Names that start
+    with the query rank first, then the most used and most recent ones.
+    Returns dicts with text, uses, last_date and the average calories (and
+    duration for workouts).
+    """
+    words = re.findall(r'\w+', query.lower())
+    if user_id is None or not words:
+        return []
+    match = f'scope:{_search_scope(user_id, kind)} AND ' + ' AND '.join(f'text:"{w}"*' for w in words)
+    starts_with = query.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    with connection() as conn:
+        rows = conn.execute('''
+        SELECT n.text, n.uses, n.last_date,
+               n.total_calories / n.uses AS calories,
+               n.total_duration / n.uses AS duration
+        FROM entry_search s
+        JOIN entry_names n ON n.id = s.rowid
+        WHERE entry_search MATCH ?
+        ORDER BY n.text LIKE ? ESCAPE '\\' DESC, n.uses DESC, n.last_date DESC
+        LIMIT ?
+        ''', (match, starts_with, limit)).fetchall()
+    return [dict(r) for r in rows]
+
+
+# Meals
+def add_meal(user_id, date, description, calories, client_id=None):
+    return _write(_add_entry, 'meal', user_id, (date, description, calories), client_id)
+
+def add_meals(user_id, rows):
+    """Insert many (date, description, calories[, client_id]) rows in one transaction."""
+    return _add_entries('meal', user_id, rows)
+
+def get_meals_for_date(user_id, date):
+    return _cached(user_id, date, 'meals', lambda: _read_meals_for_date(user_id, date))
+
+def _read_meals_for_date(user_id, date):
+    with connection() as conn:
+        rows = conn.execute('SELECT description, calories FROM meals WHERE user_id = ? AND date = ? ORDER BY id',
+                            (user_id, date)).fetchall()
     items = [{'description': r['description'], 'calories': r['calories']} for r in rows]
     total = sum(r['calories'] for r in rows)
     return items, total
 
 # Workouts
-def add_workout(date, name, duration, calories):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute('INSERT INTO workouts (date, name, duration, calories) VALUES (?,?,?,?)', (date, name, duration, calories))
-    conn.commit()
-    rowid = cur.lastrowid
-    conn.close()
-    return rowid
+def add_workout(user_id, date, name, duration, calories, client_id=None):
+    return _write(_add_entry, 'workout', user_id, (date, name, duration, calories), client_id)
 
-def get_workouts_for_date(date):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute('SELECT name, duration, calories FROM workouts WHERE date = ? ORDER BY id', (date,))
-    rows = cur.fetchall()
-    conn.close()
+def add_workouts(user_id, rows):
+    """Insert many (date, name, duration, calories[, client_id]) rows in one transaction."""
+    return _add_entries('workout', user_id, rows)
+
+def get_workouts_for_date(user_id, date):
+    return _cached(user_id, date, 'workouts', lambda: _read_workouts_for_date(user_id, date))
+
+def _read_workouts_for_date(user_id, date):
+    with connection() as conn:
+        rows = conn.execute('SELECT name, duration, calories FROM workouts WHERE user_id = ? AND date = ? ORDER BY id',
+                            (user_id, date)).fetchall()
     items = [{'name': r['name'], 'duration': r['duration'], 'calories': r['calories']} for r in rows]
     total = sum(r['calories'] for r in rows)
     return items, total
 
+# Daily summary
+def get_day_summary(user_id, date):
+    """Return a day's meals and workouts plus their calorie totals.
+
+    The items come from one statement over both tables' (user_id, date)
+    indexes and the totals from the day's daily_totals row, read in the
+    same transaction so they always agree.
+    """
+    return _cached(user_id, date, 'summary', lambda: _read_day_summary(user_id, date))
+
+def _read_day_summary(user_id, date):
+    with connection() as conn:
+        rows = conn.execute('''
+        SELECT 'meal' AS kind, id, description AS label, NULL AS duration, calories
+        FROM meals WHERE user_id = ? AND date = ?
+        UNION ALL
+        SELECT 'workout' AS kind, id, name AS label, duration, calories
+        FROM workouts WHERE user_id = ? AND date = ?
+        ORDER BY kind, id
+        ''', (user_id, date, user_id, date)).fetchall()
+        totals = _read_day_totals(user_id, date)
+    summary = {'meals': [], 'workouts': [],
+               'calories_eaten': totals['calories_eaten'], 'calories_burned': totals['calories_burned']}
+    for r in rows:
+        if r['kind'] == 'meal':
+            summary['meals'].append({'description': r['label'], 'calories': r['calories']})
+        else:
+            summary['workouts'].append({'name': r['label'], 'duration': r['duration'], 'calories': r['calories']})
+    return summary
+
+def get_all_workouts(user_id):
+    """Return every workout for a user grouped by date."""
+    with connection() as conn:
+        rows = conn.execute('SELECT date, name, duration, calories FROM workouts WHERE user_id = ? ORDER BY date, id',
+                            (user_id,)).fetchall()
+    grouped = {}
+    for r in rows:
+        grouped.setdefault(r['date'], []).append({'name': r['name'], 'duration': r['duration'], 'calories': r['calories']})
+    return grouped
+
+# Trends
+TREND_BUCKETS = {
+    'day': 'date',
+    # Monday of the ISO week the date falls in
+    'week': "date(date, 'weekday 0', '-6 days')",
+    'month': 'substr(date, 1, 7)',
+}
+
+# Goal in force per date range of a user (see goal_for_date); the first
+# profile also covers the days before it. Join on
+# date >= goal_from AND (goal_until IS NULL OR date < goal_until).
+GOALS_CTE = '''goals AS (
+    SELECT CASE WHEN ROW_NUMBER() OVER w = 1 THEN '' ELSE effective_from END AS goal_from,
+           LEAD(effective_from) OVER w AS goal_until,
+           daily_calorie_goal AS goal
+    FROM profiles WHERE user_id = :user_id
+    WINDOW w AS (ORDER BY effective_from)
+)'''
+
+def get_trends(user_id, start, end, bucket='day'):
+    """Roll up calories between start and end (inclusive) per day, week or month.
+
+    Reads one precomputed daily_totals row per day and groups them in
+    SQLite. Each day is measured against the goal that applied on it (see
+    goal_for_date). Adherence uses the same rule as completing a day:
+    percent of the goal reached, capped to 0..100, plus how many days
+    stayed at or under the goal. Only days with at least one entry are
+    counted.
+    """
+    return _cached(user_id, 'trends', f'{start}|{end}|{bucket}',
+                   lambda: _read_trends(user_id, start, end, bucket))
+
+def _read_trends(user_id, start, end, bucket):
+    bucket_expr = TREND_BUCKETS[bucket]
+    with connection() as conn:
+        rows = conn.execute(f'''
+        WITH {GOALS_CTE},
+        days AS (
+            SELECT t.date, t.calories_eaten - t.calories_burned AS net, t.calories_eaten, t.calories_burned,
+                   NULLIF(g.goal, 0) AS goal
+            FROM daily_totals t
+            LEFT JOIN goals g ON t.date >= g.goal_from AND (g.goal_until IS NULL OR t.date < g.goal_until)
+            WHERE t.user_id = :user_id AND t.date BETWEEN :start AND :end
+              AND t.meal_count + t.workout_count > 0
+        )
+        SELECT {bucket_expr} AS bucket,
+               MIN(date) AS first_day,
+               MAX(date) AS last_day,
+               COUNT(*) AS days_logged,
+               TOTAL(calories_eaten) AS calories_eaten,
+               TOTAL(calories_burned) AS calories_burned,
+               TOTAL(net) AS net_calories,
+               AVG(net) AS avg_net_calories,
+               AVG(goal) AS avg_daily_goal,
+               SUM(net <= goal) AS days_within_goal,
+               AVG(MIN(100, MAX(0, net * 100.0 / goal))) AS avg_percent_reached
+        FROM days
+        GROUP BY bucket
+        ORDER BY bucket
+        ''', {'user_id': user_id, 'start': start, 'end': end}).fetchall()
+    return [dict(r) for r in rows]
+
+DAY_SERIES_FIELDS = ('date', 'calories_eaten', 'calories_burned', 'entries', 'daily_goal', 'weight')
+
+def get_day_series(user_id, start, end):
+    """Every calendar day from start to end as columns, for analytics.
+
+    One query: each day's totals, the goal in force and the weight logged
+    on it (None when there is none). Returns {field: [value per day]}.
+    """
+    with connection() as conn:
+        rows = conn.execute(f'''
+        WITH RECURSIVE calendar(date) AS (
+            SELECT :start
+            UNION ALL
+            SELECT date(date, '+1 day') FROM calendar WHERE date < :end
+        ),
+        {GOALS_CTE}
+        SELECT c.date,
+               COALESCE(t.calories_eaten, 0.0),
+               COALESCE(t.calories_burned, 0.0),
+               COALESCE(t.meal_count + t.workout_count, 0),
+               g.goal,
+               w.weight
+        FROM calendar c
+        LEFT JOIN daily_totals t ON t.user_id = :user_id AND t.date = c.date
+        LEFT JOIN goals g ON c.date >= g.goal_from AND (g.goal_until IS NULL OR c.date < g.goal_until)
+        LEFT JOIN weights w ON w.user_id = :user_id AND w.date = c.date
+        ORDER BY c.date
+        ''', {'user_id': user_id, 'start': start, 'end': end}).fetchall()
+    columns = list(zip(*rows)) or [()] * len(DAY_SERIES_FIELDS)
+    return {field: list(values) for field, values in zip(DAY_SERIES_FIELDS, columns)}
+
 # Weights
-def add_weight(date, weight):
-    # store by ISO week key
+def week_key(date):
+    """ISO week key ("2025-W49") a weight logged on date is stored under."""
     try:
         dt = datetime.fromisoformat(date)
     except Exception:
         dt = datetime.utcnow()
     iso_year, iso_week, _ = dt.isocalendar()
-    key = f"{iso_year}-W{iso_week:02d}"
-    conn = get_conn()
-    cur = conn.cursor()
-    # Upsert by week: if exists update, else insert
-    cur.execute('SELECT id FROM weights WHERE week = ?', (key,))
-    row = cur.fetchone()
-    if row:
-        cur.execute('UPDATE weights SET date = ?, weight = ? WHERE week = ?', (date, weight, key))
-    else:
-        cur.execute('INSERT INTO weights (week, date, weight) VALUES (?,?,?)', (key, date, weight))
-    conn.commit()
-    conn.close()
+    return f"{iso_year}-W{iso_week:02d}"
+
+def add_weight(user_id, date, weight):
+    return _write(_add_weight, user_id, date, weight)
+
+def _add_weight(user_id, date, weight):
+    # One row per user and ISO week; the unique (user_id, week) index makes
+    # this a single atomic upsert, safe against concurrent submissions
+    key = week_key(date)
+    with connection(write=True) as conn:
+        conn.execute('''
+        INSERT INTO weights (user_id, week, date, weight) VALUES (?,?,?,?)
+        ON CONFLICT (user_id, week) DO UPDATE SET date = excluded.date, weight = excluded.weight
+        ''', (user_id, key, date, weight))
+        _log_changes(conn, 'weight', user_id, 'user_id = ? AND week = ?', (user_id, key))
+        _touch(conn, user_id, 'weights')
     return key
 
-def get_weights():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute('SELECT week, date, weight FROM weights ORDER BY date')
-    rows = cur.fetchall()
-    conn.close()
+def get_weights(user_id, start=None, end=None, limit=None, after=None):
+    """Return a user's weekly weights ordered by date.
+
+    start/end bound the date range (inclusive); after is the date of the
+    last item of the previous page, so pages are read straight off the
+    (user_id, date) index. limit=None returns the whole range.
+    """
+    part = f'{start}|{end}|{limit}|{after}'
+    return _cached(user_id, 'weights', part,
+                   lambda: _read_weights(user_id, start, end, limit, after))
+
+def _read_weights(user_id, start, end, limit, after):
+    sql = 'SELECT week, date, weight FROM weights WHERE user_id = ?'
+    params = [user_id]
+    if start:
+        sql += ' AND date >= ?'
+        params.append(start)
+    if end:
+        sql += ' AND date <= ?'
+        params.append(end)
+    if after:
+        sql += ' AND date > ?'
+        params.append(after)
+    sql += ' ORDER BY date'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
     return [{'week': r['week'], 'date': r['date'], 'weight': r['weight']} for r in rows]
 
 # Completed days
-def add_completed_day(date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute('''INSERT INTO completed_days (date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached) VALUES (?,?,?,?,?,?)''',
-                (date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached))
-    conn.commit()
-    rowid = cur.lastrowid
-    conn.close()
-    return rowid
-
-def get_completed_day(date):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute('SELECT date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached FROM completed_days WHERE date = ? ORDER BY id DESC LIMIT 1', (date,))
-    row = cur.fetchone()
-    conn.close()
+def add_completed_day(user_id, date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached):
+    """Record (or refresh) the completion snapshot for a day; one row per user and date."""
+    return _write(_add_completed_day, user_id, date, calories_eaten, calories_burned, net_calories,
+                  daily_goal, percent_reached)
+
+def _add_completed_day(user_id, date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached):
+    with connection(write=True) as conn:
+        conn.execute('''
+        INSERT INTO completed_days (user_id, date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached)
+        VALUES (?,?,?,?,?,?,?)
+        ON CONFLICT (user_id, date) DO UPDATE SET
+            calories_eaten = excluded.calories_eaten,
+            calories_burned = excluded.calories_burned,
+            net_calories = excluded.net_calories,
+            daily_goal = excluded.daily_goal,
+            percent_reached = excluded.percent_reached,
+            updated_at = datetime('now')
+        ''', (user_id, date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached))
+    return True
+
+FINALIZE_BATCH_SIZE = 500
+
+# Logged days whose completion snapshot is missing or no longer matches the
+# day's totals or goal. {where} narrows the days, {key} is the keyset the
+# caller pages by ("(t.user_id, t.date) > (?, ?)" after the first page).
+_STALE_DAYS_SQL = '''
+SELECT t.user_id, t.date, t.calories_eaten, t.calories_burned,
+       COALESCE((SELECT daily_calorie_goal FROM profiles p
+                 WHERE p.user_id = t.user_id AND p.effective_from <= t.date
+                 ORDER BY p.effective_from DESC LIMIT 1),
+                (SELECT daily_calorie_goal FROM profiles p
+                 WHERE p.user_id = t.user_id ORDER BY p.effective_from LIMIT 1),
+                0) AS goal
+FROM daily_totals t
+LEFT JOIN completed_days c ON c.user_id = t.user_id AND c.date = t.date
+WHERE {where} AND {key} AND t.meal_count + t.workout_count > 0
+  AND (c.user_id IS NULL
+       OR c.calories_eaten IS NOT t.calories_eaten
+       OR c.calories_burned IS NOT t.calories_burned
+       OR c.daily_goal IS NOT goal)
+ORDER BY {order}
+LIMIT ?
+'''
+
+def finalize_days(before, percent_reached, users=None, since=None, batch_size=FINALIZE_BATCH_SIZE):
+    """Write completion snapshots for logged days before the given date.
+
+    Covers days never completed and days whose snapshot no longer matches
+    their totals or goal (entries added later, goal history changed).
+    percent_reached(net, goal) is the adherence rule (analytics).
+
+    users=None checks every day. Otherwise only those users' days are
+    checked, plus every user's days from since on (the days that have
+    become past since the previous run). Returns the number of days written.
+    """
+    if users is None:
+        return _finalize_stale_days('t.date < ?', [before], ('user_id', 'date'), percent_reached, batch_size)
+    written = 0
+    for user_id in users:
+        written += _finalize_stale_days('t.user_id = ? AND t.date < ?', [user_id, before],
+                                        ('user_id', 'date'), percent_reached, batch_size)
+    if since is not None:
+        written += _finalize_stale_days('t.date >= ? AND t.date < ?', [since, before],
+                                        ('date', 'user_id'), percent_reached, batch_size)
+    return written
+
+def _finalize_stale_days(where, params, order, percent_reached, batch_size):
+    """Snapshot the stale days matching where, batch by batch.
+
+    Each batch is found in a read transaction, paging by keyset on order
+    (both columns are indexed in that order), and only the upsert of the
+    batch takes the write lock. A day changed between the two is written
+    with the totals that were read; the change is in change_log, so the
+    next run checks it again.
+    """
+    written = 0
+    position = []
+    columns = ', '.join(f't.{c}' for c in order)
+    while True:
+        key = f'({columns}) > (?, ?)' if position else '1'
+        sql = _STALE_DAYS_SQL.format(where=where, key=key, order=columns)
+        with connection() as conn:
+            rows = conn.execute(sql, params + position + [batch_size]).fetchall()
+        if rows:
+            with connection(write=True):
+                for user_id, date, eaten, burned, goal in rows:
+                    net = eaten - burned
+                    _add_completed_day(user_id, date, eaten, burned, net, goal, percent_reached(net, goal))
+        written += len(rows)
+        if len(rows) < batch_size:
+            return written
+        position = [rows[-1][c] for c in order]
+
+def get_active_users(since_seq=0):
+    """(user ids with changes after since_seq, latest change sequence)."""
+    with connection() as conn:
+        users = [r[0] for r in conn.execute('SELECT DISTINCT user_id FROM change_log WHERE seq > ?', (since_seq,))]
+        latest = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+    return users, latest
+
+def get_goal_changes(since=''):
+    """(user ids whose goal history changed at or after since, latest change time).
+
+    Times are profiles.created_at, which a resubmitted survey also sets.
+    """
+    with connection() as conn:
+        users = [r[0] for r in conn.execute('SELECT DISTINCT user_id FROM profiles WHERE created_at >= ?', (since,))]
+        latest = conn.execute("SELECT COALESCE(MAX(created_at), '') FROM profiles").fetchone()[0]
+    return users, latest
+
+def get_completed_day(user_id, date):
+    with connection() as conn:
+        row = conn.execute('''SELECT date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached
+                              FROM completed_days WHERE user_id = ? AND date = ?''', (user_id, date)).fetchone()
     if not row:
         return None
     return dict(row)
 
 
+# Export
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_QUERIES = {
+    'meal': 'SELECT date, description, calories FROM meals WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date, id',
+    'workout': 'SELECT date, name, duration, calories FROM workouts WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date, id',
+    'weight': 'SELECT date, week, weight FROM weights WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date',
+    'completed_day': '''SELECT date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached
+                        FROM completed_days WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date''',
+}
+
+def iter_export(user_id, start='', end='9999-12-31', batch_size=EXPORT_BATCH_SIZE):
+    """Yield (record_type, row dict) for all of a user's data between start and end.
+
+    Rows are pulled with fetchmany in fixed-size batches, so memory stays
+    flat however long the history is. The export uses its own connection
+    and a single read transaction: it sees one consistent snapshot, and
+    since the generator outlives the request that started it, it never
+    borrows the thread's pooled connection. The connection is closed when
+    the generator finishes or is closed.
+    """
+    conn = _open_conn()
+    try:
+        conn.execute('BEGIN')
+        for record_type, sql in EXPORT_QUERIES.items():
+            cur = conn.execute(sql, (user_id, start, end))
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for r in rows:
+                    yield record_type, dict(r)
+    finally:
+        conn.close()
+
+
 def clear_all_data():
-    """Delete all user data from the database tables (meals, workouts, weights, completed_days).
-    Used for resetting the app during development or when the user requests a full reset.
+    """Delete all data for every user (meals, workouts, weights, completed_days, users).
+    Used for resetting the app during development; a profile reset uses clear_user_data().
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute('DELETE FROM meals')
-    cur.execute('DELETE FROM workouts')
-    cur.execute('DELETE FROM weights')
-    cur.execute('DELETE FROM completed_days')
-    conn.commit()
-    # Optional: reclaim space
-    cur.execute('VACUUM')
-    conn.close()
+    with connection(write=True) as conn:
+        for table in USER_TABLES:
+            conn.execute(f'DELETE FROM {table}')
+        conn.execute('DELETE FROM users')
+        after_commit(lambda: cache.get_cache().clear())
+    # Optional: reclaim space (VACUUM cannot run inside a transaction)
+    get_conn().execute('VACUUM')
     return True
+
+
+# Maintenance (see fitness_cli.py). daily_totals and entry_names/entry_search
+# are derived from meals and workouts, so they can always be rebuilt from
+# the raw rows; this is the same aggregation migration 3 backfilled with.
+DAILY_TOTALS_FROM_ENTRIES = '''
+    SELECT user_id, date, TOTAL(eaten) AS calories_eaten, TOTAL(burned) AS calories_burned,
+           SUM(is_meal) AS meal_count, SUM(1 - is_meal) AS workout_count
+    FROM (
+        SELECT user_id, date, calories AS eaten, 0 AS burned, 1 AS is_meal FROM meals
+        UNION ALL
+        SELECT user_id, date, 0 AS eaten, calories AS burned, 0 AS is_meal FROM workouts
+    )
+    GROUP BY user_id, date'''
+
+def database_size():
+    """Bytes used by the database file and its WAL."""
+    paths = (DB_PATH, Path(f'{DB_PATH}-wal'))
+    return sum(p.stat().st_size for p in paths if p.exists())
+
+def rebuild_derived():
+    """Recompute daily_totals and the name search index, then REINDEX.
+
+    Runs in one write transaction, so readers see either the old or the
+    new derived data. Returns the row counts of daily_totals and entry_names.
+    """
+    with connection(write=True) as conn:
+        conn.execute('DELETE FROM daily_totals')
+        conn.execute('INSERT INTO daily_totals (user_id, date, calories_eaten, calories_burned, meal_count, '
+                     f'workout_count) {DAILY_TOTALS_FROM_ENTRIES}')
+        conn.execute('DELETE FROM entry_names')
+        # Clear whatever the delete triggers left behind, even in a damaged index
+        conn.execute("INSERT INTO entry_search (entry_search) VALUES ('delete-all')")
+        for kind in ENTRY_TABLES:
+            _index_entry_names(conn, kind, '1', ())
+        conn.execute("INSERT INTO entry_search (entry_search) VALUES ('optimize')")
+        conn.execute('REINDEX')
+        counts = tuple(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                       for table in ('daily_totals', 'entry_names'))
+        after_commit(lambda: cache.get_cache().clear())
+    get_conn().execute('ANALYZE')
+    return counts
+
+def compact():
+    """Checkpoint the WAL into the database and VACUUM it.
+
+    Returns the size in bytes before and after. VACUUM rewrites the whole
+    file and holds the write lock while it does.
+    """
+    before = database_size()
+    conn = get_conn()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.execute('PRAGMA optimize')
+    return before, database_size()
+
+def check_integrity():
+    """Run SQLite's checks and our own; returns a list of problems (empty if none)."""
+    problems = []
+    conn = get_conn()
+    result = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    if result != ['ok']:
+        problems += [f'integrity_check: {line}' for line in result]
+    for table, rowid, parent, _ in conn.execute('PRAGMA foreign_key_check'):
+        problems.append(f'foreign_key_check: {table} row {rowid} references a missing {parent}')
+    try:
+        conn.execute("INSERT INTO entry_search (entry_search) VALUES ('integrity-check')")
+    except sqlite3.DatabaseError as e:
+        problems.append(f'entry_search: {e}')
+
+    # Stored totals must match the raw rows (a day whose entries were all
+    # deleted keeps a row of zeros)
+    drifted = conn.execute(f'''
+    WITH fresh AS ({DAILY_TOTALS_FROM_ENTRIES})
+    SELECT d.user_id, d.date FROM daily_totals d
+    LEFT JOIN fresh f ON f.user_id = d.user_id AND f.date = d.date
+    WHERE ABS(d.calories_eaten - COALESCE(f.calories_eaten, 0)) > 0.001
+       OR ABS(d.calories_burned - COALESCE(f.calories_burned, 0)) > 0.001
+       OR d.meal_count != COALESCE(f.meal_count, 0)
+       OR d.workout_count != COALESCE(f.workout_count, 0)
+    UNION ALL
+    SELECT f.user_id, f.date FROM fresh f
+    WHERE NOT EXISTS (SELECT 1 FROM daily_totals d WHERE d.user_id = f.user_id AND d.date = f.date)
+    ''').fetchall()
+    problems += [f'daily_totals: user {user_id} on {date} does not match its meals/workouts'
+                 for user_id, date in drifted]
+    return problems
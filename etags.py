@@ -0,0 +1,27 @@
+import hashlib
+from flask import request, make_response, Response
+import db
+
+
+def conditional(user_id, scope, build, *extra):
+    """Answer a read of one user's scope, honouring If-None-Match.
+
+    The strong ETag is derived from the scope's version in db.data_versions
+    (bumped by every write helper) plus anything else the body depends on:
+    the route, its query string and any extra values passed in (e.g. the
+    session's calorie goal). When the client already has that ETag a 304
+    is sent without reading any rows; otherwise build() produces the
+    response and the ETag is attached to it.
+    """
+    version = db.get_version(user_id, scope) if user_id is not None else 0
+    parts = (user_id, scope, version, request.path, request.query_string.decode()) + extra
+    etag = hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+    response.set_etag(etag)
+    # Let the browser keep the body but always revalidate it with us
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
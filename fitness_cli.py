@@ -0,0 +1,395 @@
+# Program Name: fitness_cli.py
+#
+# Description:
+#   Command-line access to the tracker's database (db.py), for backfills
+#   and ops work without going through HTTP. Replaces the original
+#   interactive scripts (aurora_fitness_tracker.py, avaan_meals.py), whose
+#   data only lived in memory. Subcommands:
+#       users       list users (--create adds one and prints its id)
+#       profile     save a survey answer (calorie goal) for a user
+#       import      bulk-load CSV or NDJSON files in the /api/export format
+#       day         meals, workouts and totals of one day
+#       summary     per-day adherence and rolling averages over a range
+#       reindex     rebuild daily totals and the search index, REINDEX
+#       compact     checkpoint the WAL and VACUUM
+#       check       integrity checks; exits 1 when something is wrong
+#
+# Usage:
+#   python fitness_cli.py users --create
+#   python fitness_cli.py profile 1 --age 30 --current-weight 200 --goal-weight 180 --weeks 20
+#   python fitness_cli.py import 1 export.csv more.ndjson
+#   cat rows.ndjson | python fitness_cli.py import 1 - --source backfill-2026-10
+#   python fitness_cli.py summary 1 --start 2026-09-01 --end 2026-09-30
+#   python fitness_cli.py check
+#
+# Imports are streamed: rows are parsed one at a time and written in
+# transactions of --batch-size rows, so memory stays flat for any file
+# size. Meals and workouts get a client_id derived from the file name,
+# line number and row, so re-running an import after a failure skips the
+# rows that already landed; weights and completed days are upserts anyway.
+# Uses FITNESS_DB_PATH like the app. The web app's in-process read cache
+# does not see these writes (see cache.py); restart it after a backfill
+# unless a shared cache backend is configured.
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+import analytics
+import db
+
+IMPORT_BATCH_SIZE = 1000
+RECORD_TYPES = ('meal', 'workout', 'weight', 'completed_day')
+
+
+# -----------------------------
+#   PARSING
+# -----------------------------
+
+def _text(record, field):
+    value = str(record.get(field) or '').strip()
+    if not value:
+        raise ValueError(f"missing {field}")
+    return value
+
+
+def _date(record):
+    value = _text(record, 'date')
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"date is not YYYY-MM-DD: {value!r}")
+    return value
+
+
+def _number(record, field, positive=True, required=True):
+    value = record.get(field)
+    if value is None or value == '':
+        if required:
+            raise ValueError(f"missing {field}")
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} is not a number: {value!r}")
+    if positive and number <= 0:
+        raise ValueError(f"{field} must be positive")
+    return number
+
+
+def parse_record(record):
+    """Validate one import row; returns (type, values) in db argument order."""
+    kind = str(record.get('type') or '').strip()
+    if kind == 'meal':
+        return kind, (_date(record), _text(record, 'description'), _number(record, 'calories'))
+    if kind == 'workout':
+        return kind, (_date(record), _text(record, 'name'), _number(record, 'duration'),
+                      _number(record, 'calories'))
+    if kind == 'weight':
+        return kind, (_date(record), _number(record, 'weight'))
+    if kind == 'completed_day':
+        eaten = _number(record, 'calories_eaten', positive=False)
+        burned = _number(record, 'calories_burned', positive=False)
+        net = _number(record, 'net_calories', positive=False, required=False)
+        # 0 is what the app stores for a day without a goal
+        goal = _number(record, 'daily_goal', positive=False, required=False)
+        percent = _number(record, 'percent_reached', positive=False, required=False)
+        if percent is None:
+            percent = analytics.percent_reached(eaten - burned, goal)
+        return kind, (_date(record), eaten, burned, eaten - burned if net is None else net, goal, int(percent))
+    raise ValueError(f"unknown type {kind!r} (expected one of {', '.join(RECORD_TYPES)})")
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, raw dict) from a CSV or NDJSON stream, one row at a time.
+
+    A line that isn't valid JSON is passed on as an error message instead.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, f"invalid JSON: {e}"
+            continue
+        yield line_number, row if isinstance(row, dict) else "expected a JSON object"
+
+
+def client_id(source, line_number, kind, values):
+    key = json.dumps([source, line_number, kind, values])
+    return 'import:' + hashlib.sha1(key.encode()).hexdigest()[:24]
+
+
+# -----------------------------
+#   IMPORT
+# -----------------------------
+
+def _write_batch(user_id, batch, counts):
+    """Write one batch in a single transaction (the db helpers join it)."""
+    by_kind = {kind: [] for kind in RECORD_TYPES}
+    for kind, values in batch:
+        by_kind[kind].append(values)
+    with db.connection(write=True):
+        if by_kind['meal']:
+            counts['meal'] += db.add_meals(user_id, by_kind['meal'])
+        if by_kind['workout']:
+            counts['workout'] += db.add_workouts(user_id, by_kind['workout'])
+        for values in by_kind['weight']:
+            db.add_weight(user_id, *values)
+            counts['weight'] += 1
+        for values in by_kind['completed_day']:
+            db.add_completed_day(user_id, *values)
+            counts['completed_day'] += 1
+
+
+def import_rows(user_id, rows, source, batch_size=IMPORT_BATCH_SIZE, on_error=None):
+    """Validate and store rows from read_rows(); returns counts per type.
+
+    counts['skipped'] are meals/workouts already imported from the same
+    source line, counts['rejected'] rows that failed validation.
+    """
+    counts = dict.fromkeys(RECORD_TYPES + ('rejected', 'skipped'), 0)
+    batch = []
+    entries = 0
+    for line_number, row in rows:
+        try:
+            if isinstance(row, str):
+                raise ValueError(row)
+            kind, values = parse_record(row)
+        except ValueError as e:
+            counts['rejected'] += 1
+            if on_error:
+                on_error(line_number, e)
+            continue
+        if kind in ('meal', 'workout'):
+            values += (client_id(source, line_number, kind, values),)
+            entries += 1
+        batch.append((kind, values))
+        if len(batch) >= batch_size:
+            _write_batch(user_id, batch, counts)
+            batch = []
+    if batch:
+        _write_batch(user_id, batch, counts)
+    counts['skipped'] = entries - counts['meal'] - counts['workout']
+    return counts
+
+
+def _detect_format(path, fmt):
+    if fmt != 'auto':
+        return fmt
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def cmd_import(args):
+    _require_user(args.user_id)
+    failed = False
+    for path in args.files:
+        fmt = _detect_format(path, args.format)
+        if path == '-':
+            if args.format == 'auto':
+                raise SystemExit("--format is required when reading stdin")
+            if not args.source:
+                raise SystemExit("--source is required when reading stdin (it keys re-runs)")
+        source = args.source or os.path.basename(path)
+
+        def report(line_number, error, path=path):
+            print(f"{path}:{line_number}: {error}", file=sys.stderr)
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            counts = import_rows(args.user_id, read_rows(stream, fmt), source, args.batch_size, report)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        print(f"{path}: " + ', '.join(f"{count} {name}" for name, count in counts.items()))
+        failed = failed or counts['rejected'] > 0
+    return 1 if failed else 0
+
+
+# -----------------------------
+#   READS
+# -----------------------------
+
+def _require_user(user_id):
+    if not db.user_exists(user_id):
+        raise SystemExit(f"No user {user_id} (create one with: users --create)")
+
+
+def _print_json(data):
+    print(json.dumps(data, indent=2))
+
+
+def cmd_users(args):
+    if args.create:
+        print(db.create_user())
+        return 0
+    users = db.list_users()
+    if args.json:
+        _print_json(users)
+        return 0
+    print(f"{'id':>6}  {'created':19}  {'days':>5}  last day")
+    for user in users:
+        note = '  (pre-user data, not claimed yet)' if user['legacy'] else ''
+        print(f"{user['id']:>6}  {user['created_at']:19}  {user['days_logged']:>5}  {user['last_date'] or '-'}{note}")
+    return 0
+
+
+def cmd_profile(args):
+    _require_user(args.user_id)
+    profile = analytics.calculate_calorie_goal(args.age, args.current_weight, args.goal_weight, args.weeks)
+    db.save_profile(args.user_id, profile, args.effective_from)
+    print(f"Daily calorie goal from {args.effective_from}: {profile['daily_calorie_goal']:.0f} cal/day "
+          f"(maintenance {profile['estimated_maintenance']:.0f}, change {profile['pounds_change']:+.1f} lbs "
+          f"over {profile['days']:.0f} days)")
+    return 0
+
+
+def cmd_day(args):
+    _require_user(args.user_id)
+    summary = db.get_day_summary(args.user_id, args.date)
+    goal = db.goal_for_date(args.user_id, args.date)
+    net = summary['calories_eaten'] - summary['calories_burned']
+    if args.json:
+        _print_json({'date': args.date, 'daily_goal': goal, 'net_calories': net, **summary})
+        return 0
+    print(f"--- {args.date} ---")
+    for meal in summary['meals']:
+        print(f"meal     {meal['description']} - {meal['calories']:.0f} cal")
+    for workout in summary['workouts']:
+        print(f"workout  {workout['name']} - {workout['duration']:.0f} min, {workout['calories']:.0f} cal")
+    print(f"eaten {summary['calories_eaten']:.0f}, burned {summary['calories_burned']:.0f}, net {net:.0f}"
+          + (f" (goal {goal:.0f})" if goal else ""))
+    return 0
+
+
+def _fmt(value, spec='.0f'):
+    return '-' if value is None else format(value, spec)
+
+
+def cmd_summary(args):
+    _require_user(args.user_id)
+    end = date.fromisoformat(args.end) if args.end else date.today()
+    start = date.fromisoformat(args.start) if args.start else end - timedelta(days=29)
+    if start > end:
+        raise SystemExit("--start must not be after --end")
+    profile = db.get_profile(args.user_id)
+    # Same lookback as /api/analytics so the first rolling averages are full
+    first = start - timedelta(days=analytics.LOOKBACK_DAYS)
+    series = db.get_day_series(args.user_id, first.isoformat(), end.isoformat())
+    result = analytics.analyze_range(series, start.isoformat(),
+                                     goal_weight=profile['goal_weight'] if profile else None,
+                                     current_weight=profile['current_weight'] if profile else None)
+    if args.json:
+        _print_json({'start': start.isoformat(), 'end': end.isoformat(), **result})
+        return 0
+
+    print(f"{'date':10}  {'eaten':>6}  {'burned':>6}  {'net':>6}  {'goal':>6}  {'%':>4}  {'7d avg':>7}  {'30d avg':>7}")
+    for day in result['days']:
+        print(f"{day['date']:10}  {_fmt(day['calories_eaten']):>6}  {_fmt(day['calories_burned']):>6}  "
+              f"{_fmt(day['net_calories']):>6}  {_fmt(day['daily_goal']):>6}  {_fmt(day['percent_reached'], 'd'):>4}  "
+              f"{_fmt(day['avg_net_7d']):>7}  {_fmt(day['avg_net_30d']):>7}")
+    summary = result['summary']
+    print(f"\n{summary['days_logged']} of {summary['days']} days logged, "
+          f"average net {_fmt(summary['avg_net_calories'])} cal, "
+          f"average {_fmt(summary['avg_percent_reached'], '.1f')}% of goal, "
+          f"{_fmt(summary['days_within_goal'], 'd')} day(s) within goal")
+    projection = result['projection']
+    if projection:
+        print(f"At {projection['pounds_per_week']:+.2f} lbs/week from {projection['weight']:.1f} lbs: "
+              f"goal of {projection['goal_weight']:.1f} lbs "
+              + (f"reached around {projection['projected_date']}" if projection['projected_date']
+                 else "not reached on this trend"))
+    return 0
+
+
+# -----------------------------
+#   MAINTENANCE
+# -----------------------------
+
+def cmd_reindex(args):
+    totals, names = db.rebuild_derived()
+    print(f"Rebuilt {totals} daily total(s) and {names} search name(s)")
+    return 0
+
+
+def cmd_compact(args):
+    before, after = db.compact()
+    print(f"Compacted {before / 1024:.0f} KiB -> {after / 1024:.0f} KiB")
+    return 0
+
+
+def cmd_check(args):
+    problems = db.check_integrity()
+    for problem in problems:
+        print(problem)
+    print("ok" if not problems else f"{len(problems)} problem(s) found; `reindex` rebuilds derived data")
+    return 1 if problems else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch and maintenance commands for the fitness tracker database")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    users = commands.add_parser('users', help="list users")
+    users.add_argument('--create', action='store_true', help="create a user and print its id")
+    users.add_argument('--json', action='store_true')
+    users.set_defaults(func=cmd_users)
+
+    profile = commands.add_parser('profile', help="save a survey answer for a user")
+    profile.add_argument('user_id', type=int)
+    profile.add_argument('--age', type=int, required=True)
+    profile.add_argument('--current-weight', type=float, required=True)
+    profile.add_argument('--goal-weight', type=float, required=True)
+    profile.add_argument('--weeks', type=float, required=True)
+    profile.add_argument('--from', dest='effective_from', default=date.today().isoformat(),
+                         help="date the goal applies from (default today)")
+    profile.set_defaults(func=cmd_profile)
+
+    load = commands.add_parser('import', help="bulk-load CSV/NDJSON files (the /api/export format)")
+    load.add_argument('user_id', type=int)
+    load.add_argument('files', nargs='+', help="files to load, - for stdin")
+    load.add_argument('--format', choices=['auto', 'csv', 'ndjson'], default='auto',
+                      help="default: by file extension (.ndjson/.jsonl/.json, else csv)")
+    load.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help="rows per transaction")
+    load.add_argument('--source', help="name that keys re-runs (default the file name)")
+    load.set_defaults(func=cmd_import)
+
+    day = commands.add_parser('day', help="entries and totals of one day")
+    day.add_argument('user_id', type=int)
+    day.add_argument('date')
+    day.add_argument('--json', action='store_true')
+    day.set_defaults(func=cmd_day)
+
+    summary = commands.add_parser('summary', help="adherence and rolling averages over a range")
+    summary.add_argument('user_id', type=int)
+    summary.add_argument('--start', help="YYYY-MM-DD (default 29 days before --end)")
+    summary.add_argument('--end', help="YYYY-MM-DD (default today)")
+    summary.add_argument('--json', action='store_true')
+    summary.set_defaults(func=cmd_summary)
+
+    commands.add_parser('reindex', help="rebuild daily totals and the search index").set_defaults(func=cmd_reindex)
+    commands.add_parser('compact', help="checkpoint the WAL and VACUUM").set_defaults(func=cmd_compact)
+    commands.add_parser('check', help="run integrity checks").set_defaults(func=cmd_check)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'batch_size', 1) < 1:
+        raise SystemExit("--batch-size must be at least 1")
+    db.init_db()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
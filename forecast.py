@@ -0,0 +1,161 @@
+"""Weight trend smoothing and goal-date forecast.
+
+The weekly weight series is smoothed with an exponential moving average
+and a least-squares line through the last FIT_WEEKS points. The trend is
+cross-checked against what the logged net calories of the last 30 days
+imply under the 3500 kcal per pound model (see analytics).
+
+The fitting state is cached per user along with the change_log sequence
+it has seen. A repeat request with no new changes returns the cached
+forecast; weeks added after the last fitted one are folded into the
+state without re-reading the history; an edit to an earlier week refits
+from scratch (a single indexed read of the user's weights).
+"""
+import copy
+from datetime import date, timedelta
+
+import analytics
+import cache
+import db
+
+# Weight of a new weekly point in the moving average (scaled for gaps)
+EMA_ALPHA = 0.3
+FIT_WEEKS = 12
+# Trend and calorie model agree when they are this close (lbs/week)
+AGREEMENT_LBS_PER_WEEK = 1.0
+CHANGE_BATCH = 500
+
+
+def _new_state():
+    return {'seq': 0, 'last_week': None, 'ema': None, 'ema_date': None, 'window': [], 'points': 0}
+
+
+def fold(state, weights):
+    """Add weekly weights (dicts with week, date, weight; oldest first)."""
+    for item in weights:
+        if state['ema'] is None:
+            state['ema'] = item['weight']
+        else:
+            gap = (date.fromisoformat(item['date']) - date.fromisoformat(state['ema_date'])).days
+            alpha = 1 - (1 - EMA_ALPHA) ** (max(gap, 1) / 7)
+            state['ema'] += alpha * (item['weight'] - state['ema'])
+        state['ema_date'] = item['date']
+        state['last_week'] = item['week']
+        state['window'] = (state['window'] + [[item['date'], item['weight']]])[-FIT_WEEKS:]
+        state['points'] += 1
+    return state
+
+
+def least_squares_slope(window):
+    """Slope of weight over time in lbs/day, None with fewer than two points."""
+    if len(window) < 2:
+        return None
+    xs = [date.fromisoformat(d).toordinal() for d, _ in window]
+    ys = [w for _, w in window]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+
+
+def _update_state(user_id, state, latest_seq):
+    """Bring a cached state up to latest_seq, or refit when it can't be.
+
+    Returns a new state: the cached one may be shared with other threads
+    updating it at the same time, so it is never modified.
+    """
+    if state is not None:
+        changes, cursor = db.get_changes(user_id, state['seq'], CHANGE_BATCH, entity='weight')
+        # Later logs of the same week replace earlier ones
+        new_weeks = {}
+        for change in changes:
+            new_weeks[change['data']['week']] = change['data']
+        appends_only = all(state['last_week'] is None or week > state['last_week'] for week in new_weeks)
+        if len(changes) < CHANGE_BATCH and appends_only:
+            state = fold(copy.deepcopy(state), sorted(new_weeks.values(), key=lambda w: w['date']))
+            # Changes committed after latest_seq was read may be folded in
+            # too; marking them unseen would force a refit next time
+            state['seq'] = max(latest_seq, cursor)
+            return state
+
+    state = fold(_new_state(), db.get_weights(user_id))
+    state['seq'] = latest_seq
+    return state
+
+
+def _calorie_check(user_id, today, weight):
+    """Average net calories of the last 30 days and the weight change they imply."""
+    window = max(analytics.ROLLING_WINDOWS)
+    series = db.get_day_series(user_id, (today - timedelta(days=window - 1)).isoformat(), today.isoformat())
+    nets = [e - b for e, b, n in zip(series['calories_eaten'], series['calories_burned'], series['entries']) if n]
+    if not nets:
+        return None, None
+    avg_net = sum(nets) / len(nets)
+    return avg_net, analytics.calorie_weight_change(avg_net, weight)
+
+
+def get_forecast(user_id, goal_weight=None, today=None):
+    """Smoothed weight trend and projected goal dates for a user."""
+    today = today or date.today()
+    store = cache.get_cache()
+    latest_seq = db.get_latest_seq(user_id)
+    key = f'{latest_seq}|{today.isoformat()}|{goal_weight}'
+
+    cached = store.get(user_id, 'forecast', 'result')
+    if cached is not None and cached['key'] == key:
+        return cached['forecast']
+
+    state = store.get(user_id, 'forecast', 'state')
+    if state is None or state['seq'] != latest_seq:
+        state = _update_state(user_id, state, latest_seq)
+        store.put(user_id, 'forecast', 'state', state)
+
+    result = _build(user_id, state, goal_weight, today)
+    store.put(user_id, 'forecast', 'result', {'key': key, 'forecast': result})
+    return result
+
+
+def _build(user_id, state, goal_weight, today):
+    result = {
+        'as_of': today.isoformat(),
+        'points': state['points'],
+        'goal_weight': goal_weight,
+        'latest': None,
+        'trend_weight': None,
+        'trend_lbs_per_week': None,
+        'projected_date': None,
+        'calorie_model': None,
+        'agreement': None,
+    }
+    if not state['points']:
+        return result
+
+    last_date, last_weight = state['window'][-1]
+    from_day = date.fromisoformat(last_date)
+    trend = state['ema']
+    slope = least_squares_slope(state['window'])
+    result.update({
+        'latest': {'date': last_date, 'weight': last_weight},
+        'trend_weight': round(trend, 2),
+        'trend_lbs_per_week': round(slope * 7, 3) if slope is not None else None,
+    })
+    if goal_weight is not None and slope is not None:
+        projected = analytics.goal_date(from_day, trend, goal_weight, slope)
+        result['projected_date'] = projected.isoformat() if projected else None
+
+    avg_net, calorie_change = _calorie_check(user_id, today, trend)
+    if calorie_change is not None:
+        projected = analytics.goal_date(today, trend, goal_weight, calorie_change) if goal_weight is not None else None
+        result['calorie_model'] = {
+            'avg_net_calories': round(avg_net, 1),
+            'lbs_per_week': round(calorie_change * 7, 3),
+            'projected_date': projected.isoformat() if projected else None,
+        }
+        if slope is not None:
+            difference = slope * 7 - calorie_change * 7
+            result['agreement'] = {
+                'difference_lbs_per_week': round(difference, 3),
+                'consistent': abs(difference) <= AGREEMENT_LBS_PER_WEEK,
+            }
+    return result
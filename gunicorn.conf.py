@@ -0,0 +1,58 @@
+# Gunicorn settings, picked up automatically from the working directory.
+#
+# Sync mode (default, what render.yaml runs):
+#     gunicorn app:app
+#   Each worker process serves GUNICORN_THREADS requests at a time with
+#   threads (gthread). Threads share the worker's read cache and each keeps
+#   its own SQLite connection.
+#
+# Async mode (ASGI, see asgi.py):
+#     gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+#   Connections are handled by an event loop; a2wsgi runs the Flask
+#   handlers on ASGI_THREADS pool threads per worker. Use this for many
+#   concurrent, mostly idle dashboard clients.
+#
+# WEB_CONCURRENCY sets the number of worker processes for both modes. Each
+# process keeps its own read cache unless a shared backend is configured
+# (see cache.py); SQLite still allows only one writer at a time, so more
+# processes mainly help CPU-bound work.
+#
+# GROUP_COMMIT_WINDOW_MS (default 0 = off) batches single-entry writes from
+# concurrent requests into one transaction per window; see writer.py for
+# the durability contract. Each worker flushes its queue when it exits.
+#
+# GUNICORN_PRELOAD=1 imports the app once in the master and forks workers
+# from it, so new and restarted workers skip the imports and schema check.
+# Safe because nothing is left running at import time: db.init_db() closes
+# its SQLite handle, and the scheduler, group-commit writer and connections
+# are all started lazily inside each worker. Code reloads then need a full
+# restart instead of a HUP. Each worker logs how long it took to boot.
+import os
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+# threads > 1 makes gunicorn use the gthread worker for app:app
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 20
+keepalive = 5
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0').lower() in ('1', 'true', 'yes', 'on')
+
+_forked_at = None
+
+
+def post_fork(server, worker):
+    global _forked_at
+    _forked_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s ready %.0f ms after fork (preload_app=%s)",
+                    worker.pid, (time.perf_counter() - _forked_at) * 1000, preload_app)
+
+
+def worker_exit(server, worker):
+    # Commit anything still waiting in the group-commit queue
+    import writer
+    writer.close()
@@ -0,0 +1,266 @@
+"""Request and database instrumentation, exposed as Prometheus text.
+
+Collected when METRICS_ENABLED is on (the default; set it to 0 to turn all
+of it off, including the /metrics route):
+    - http_request_duration_seconds: latency histogram per route and method
+    - db_query_duration_seconds: time to execute each statement (up to its
+      first row), labelled by statement kind and table
+    - db_rows_total: rows read by fetches and rows written by DML
+    - db_connections_opened_total: new SQLite connections
+    - cache_*: counters of the read cache
+    - db_group_commit*: batches and writes of the group-commit writer, when on
+    - app_boot_seconds: how long importing app.py took, per phase
+Statements slower than SLOW_QUERY_MS are logged with their SQL.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from flask import Response, g, request
+
+ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no', 'off')
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+# Seconds; tuned for a small SQLite-backed app where most requests take
+# well under 10 ms
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+logger = logging.getLogger(__name__)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f'{self.name}_bucket{_format_labels(key + (("le", bound),))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_format_labels(key + (("le", "+Inf"),))} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {total:.6f}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+request_duration = Histogram('http_request_duration_seconds', 'HTTP request latency by route.')
+query_duration = Histogram('db_query_duration_seconds', 'SQLite statement execution time (to first row).')
+rows_total = Counter('db_rows_total', 'Rows read or written by SQLite statements.')
+connections_opened = Counter('db_connections_opened_total', 'SQLite connections opened.')
+slow_queries = Counter('db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.')
+
+REGISTRY = [request_duration, query_duration, rows_total, connections_opened, slow_queries]
+
+
+# -----------------------------
+#   SQLITE INSTRUMENTATION
+# -----------------------------
+
+_STATEMENT = re.compile(r'\s*(\w+)(?:.*?\b(?:FROM|INTO|UPDATE|TABLE|INDEX\s+\w+\s+ON)\s+(\w+))?',
+                        re.IGNORECASE | re.DOTALL)
+_labels_by_sql = {}
+
+
+def statement_label(sql):
+    """Low-cardinality label for a statement, e.g. "select meals"."""
+    label = _labels_by_sql.get(sql)
+    if label is None:
+        match = _STATEMENT.match(sql)
+        verb = match.group(1).lower() if match else 'other'
+        label = f'{verb} {match.group(2)}' if match and match.group(2) else verb
+        if len(_labels_by_sql) < 1000:
+            _labels_by_sql[sql] = label
+    return label
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def _record(self, sql, started, written):
+        elapsed = time.perf_counter() - started
+        self._label = statement_label(sql)
+        query_duration.observe(elapsed, query=self._label)
+        if written and self.rowcount > 0:
+            rows_total.inc(self.rowcount, query=self._label, kind='written')
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_queries.inc(query=self._label)
+            logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, ' '.join(sql.split()))
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._record(sql, started, written=self.description is None)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._record(sql, started, written=True)
+        return self
+
+    def _count(self, rows):
+        if rows:
+            rows_total.inc(len(rows), query=getattr(self, '_label', 'other'), kind='read')
+        return rows
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self._count([row])
+        return row
+
+    def fetchmany(self, size=None):
+        return self._count(super().fetchmany(self.arraysize if size is None else size))
+
+    def fetchall(self):
+        return self._count(super().fetchall())
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose statements go through InstrumentedCursor."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        connections_opened.inc()
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    return InstrumentedConnection if ENABLED else sqlite3.Connection
+
+
+# -----------------------------
+#   FLASK INTEGRATION
+# -----------------------------
+
+def _cache_lines():
+    import cache
+    stats = cache.get_cache().stats()
+    lines = []
+    for name, help_text in (('hits', 'Read cache hits.'), ('misses', 'Read cache misses.'),
+                            ('invalidations', 'Read cache invalidations.')):
+        lines += [f'# HELP cache_{name}_total {help_text}', f'# TYPE cache_{name}_total counter',
+                  f'cache_{name}_total {stats[name]}']
+    if 'entries' in stats:
+        lines += ['# HELP cache_entries Groups held by the read cache.', '# TYPE cache_entries gauge',
+                  f'cache_entries {stats["entries"]}']
+    return lines
+
+
+def _writer_lines():
+    import writer
+    group = writer.get_writer()
+    if group is None:
+        return []
+    stats = group.stats()
+    return ['# HELP db_group_commits_total Transactions committed by the group-commit writer.',
+            '# TYPE db_group_commits_total counter', f'db_group_commits_total {stats["batches"]}',
+            '# HELP db_group_commit_writes_total Writes committed through the group-commit writer.',
+            '# TYPE db_group_commit_writes_total counter', f'db_group_commit_writes_total {stats["rows"]}']
+
+
+# phase -> seconds, filled in by app.py once it has finished loading
+boot_seconds = {}
+
+
+def record_boot(**phases):
+    boot_seconds.update(phases)
+
+
+def _boot_lines():
+    if not boot_seconds:
+        return []
+    lines = ['# HELP app_boot_seconds Time spent loading the app, by phase.', '# TYPE app_boot_seconds gauge']
+    for phase, seconds in boot_seconds.items():
+        lines.append(f'app_boot_seconds{_format_labels([("phase", phase)])} {seconds:.6f}')
+    return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += _cache_lines()
+    lines += _writer_lines()
+    lines += _boot_lines()
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Time every request and serve the collected metrics on /metrics."""
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            request_duration.observe(time.perf_counter() - started, route=route, method=request.method,
+                                     status=response.status_code)
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,248 @@
+# Program Name: scheduler.py
+#
+# Description:
+#   Background jobs that keep heavy work off the request path:
+#       - finalize_days: stores the completion snapshot of every past day
+#         with entries (the same record /api/complete-day writes), and
+#         refreshes snapshots whose day or goal changed afterwards. After
+#         the first run it only looks at what changed since the last one,
+#         and it takes the write lock only to store each batch
+#       - refresh_rollups: recomputes the default day/week/month trend
+#         rollups and the weight forecast of users who changed something
+#         since the last run, so dashboard loads find them cached
+#   A failing job is retried with exponential backoff (RETRY_BASE_SECONDS,
+#   doubling up to RETRY_MAX_SECONDS) and goes back to its normal interval
+#   after the next success.
+#
+# Usage:
+#   In-process: app.py starts a daemon thread with the first request it
+#   serves, unless SCHEDULER_ENABLED=0.
+#   Standalone worker (e.g. a separate service next to several web
+#   workers, which should then set SCHEDULER_ENABLED=0):
+#       python scheduler.py           # run until SIGTERM/Ctrl-C
+#       python scheduler.py --once    # run every job once and exit
+#   Cache warming only helps readers that share the cache: the thread
+#   inside the web process, or a worker when cache.py is configured with
+#   a shared backend. Finalizing days works from anywhere.
+#
+# The clock is injectable: Scheduler(jobs, clock=...) takes any callable
+# returning a datetime, and jobs receive that "now", so tests can step
+# through days and retries without waiting.
+
+import argparse
+import logging
+import os
+import signal
+import threading
+from datetime import datetime, timedelta
+
+import analytics
+import db
+import forecast
+
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '1').lower() not in ('0', 'false', 'no', 'off')
+FINALIZE_INTERVAL = timedelta(minutes=int(os.environ.get('FINALIZE_INTERVAL_MINUTES', 15)))
+ROLLUP_INTERVAL = timedelta(minutes=int(os.environ.get('ROLLUP_INTERVAL_MINUTES', 5)))
+# Let the app finish starting before the first run
+FIRST_RUN_DELAY = timedelta(seconds=30)
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 30 * 60
+# Upper bound on one idle wait, so a stopped scheduler exits promptly
+MAX_SLEEP_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+# Requests on several threads may all try to start the scheduler at once.
+# Reentrant: start_in_background() calls Scheduler.start() while holding it.
+_start_lock = threading.RLock()
+
+
+class Job:
+    def __init__(self, name, func, interval, first_delay=FIRST_RUN_DELAY):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.first_delay = first_delay
+        self.next_run = None
+        self.failures = 0
+        self.last_success = None
+        self.last_error = None
+
+
+class Scheduler:
+    def __init__(self, jobs, clock=datetime.now, retry_base=RETRY_BASE_SECONDS, retry_max=RETRY_MAX_SECONDS):
+        self.jobs = list(jobs)
+        self.clock = clock
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        start = clock()
+        for job in self.jobs:
+            job.next_run = start + job.first_delay
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_pending(self):
+        """Run every job that is due; returns the names of the jobs run."""
+        ran = []
+        for job in self.jobs:
+            now = self.clock()
+            if job.next_run > now:
+                continue
+            ran.append(job.name)
+            try:
+                job.func(now)
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e)
+                delay = min(self.retry_base * 2 ** (job.failures - 1), self.retry_max)
+                job.next_run = now + timedelta(seconds=delay)
+                logger.exception("Job %s failed (attempt %d), retrying in %ds", job.name, job.failures, delay)
+            else:
+                job.failures = 0
+                job.last_error = None
+                job.last_success = now
+                job.next_run = now + job.interval
+        return ran
+
+    def run_all(self):
+        """Run every job now regardless of schedule (worker --once)."""
+        for job in self.jobs:
+            job.next_run = self.clock()
+        return self.run_pending()
+
+    def seconds_until_next(self):
+        next_run = min(job.next_run for job in self.jobs)
+        return max(0.0, (next_run - self.clock()).total_seconds())
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(min(self.seconds_until_next(), MAX_SLEEP_SECONDS))
+
+    def start(self):
+        """Run the jobs on a daemon thread of this process."""
+        with _start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self.run_forever, name='scheduler', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        return [{"name": job.name,
+                 "next_run": job.next_run.isoformat(timespec='seconds'),
+                 "last_success": job.last_success.isoformat(timespec='seconds') if job.last_success else None,
+                 "failures": job.failures,
+                 "last_error": job.last_error} for job in self.jobs]
+
+
+# -----------------------------
+#   JOBS
+# -----------------------------
+
+class DayFinalizer:
+    """Complete every logged day before today (by the scheduler's clock).
+
+    The first run checks every day once. Later runs only check the days of
+    users with new entries (change_log) or goal changes since the previous
+    run, plus everyone's days that have become past since then.
+    """
+
+    def __init__(self):
+        self.last_seq = None
+        self.last_goal_change = ''
+        self.last_before = None
+
+    def __call__(self, now):
+        before = now.date().isoformat()
+        # Read the marks before looking at any day: whatever is written
+        # during the run is after them and gets checked next time
+        users, latest = db.get_active_users(self.last_seq or 0)
+        goal_users, latest_goal_change = db.get_goal_changes(self.last_goal_change)
+        if self.last_seq is None:
+            written = db.finalize_days(before, analytics.percent_reached)
+        else:
+            written = db.finalize_days(before, analytics.percent_reached,
+                                       users=sorted(set(users) | set(goal_users)), since=self.last_before)
+        # Only advance once the run succeeded, so a failed run is retried whole
+        self.last_seq, self.last_goal_change, self.last_before = latest, latest_goal_change, before
+        if written:
+            logger.info("Finalized %d day(s)", written)
+        return written
+
+
+class RollupRefresher:
+    """Recompute cached rollups of users with changes since the last run."""
+
+    TREND_DAYS = 30
+
+    def __init__(self):
+        self.last_seq = 0
+
+    def __call__(self, now):
+        users, latest = db.get_active_users(self.last_seq)
+        today = now.date()
+        start = (today - timedelta(days=self.TREND_DAYS - 1)).isoformat()
+        for user_id in users:
+            # Same default range /api/trends uses, for every bucket
+            for bucket in db.TREND_BUCKETS:
+                db.get_trends(user_id, start, today.isoformat(), bucket)
+            profile = db.get_profile(user_id)
+            forecast.get_forecast(user_id, profile['goal_weight'] if profile else None, today)
+        # Only advance once every user is done, so a failed run is retried whole
+        self.last_seq = latest
+        return len(users)
+
+
+def default_jobs():
+    return [
+        Job('finalize_days', DayFinalizer(), FINALIZE_INTERVAL),
+        Job('refresh_rollups', RollupRefresher(), ROLLUP_INTERVAL),
+    ]
+
+
+_scheduler = None
+
+
+def start_in_background():
+    """Start the in-process scheduler once per process (if enabled)."""
+    global _scheduler
+    if not SCHEDULER_ENABLED:
+        return None
+    with _start_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler(default_jobs())
+        return _scheduler.start()
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the fitness tracker's background jobs")
+    parser.add_argument('--once', action='store_true', help="run every job once and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    db.init_db()
+    scheduler = Scheduler(default_jobs())
+    if args.once:
+        scheduler.run_all()
+        return 1 if any(job.failures for job in scheduler.jobs) else 0
+
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
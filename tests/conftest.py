@@ -0,0 +1,46 @@
+"""Shared fixtures: every test gets its own database file.
+
+The environment is set before anything from the app is imported, since
+app.py reads SECRET_KEY and db.py reads FITNESS_DB_PATH at import time.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ.setdefault('SCHEDULER_ENABLED', '0')
+os.environ.setdefault('FITNESS_DB_PATH', str(Path(tempfile.mkdtemp()) / 'import.db'))
+
+import pytest
+
+import cache
+import db
+
+
+@pytest.fixture(autouse=True)
+def fresh_db(tmp_path, monkeypatch):
+    """A migrated, empty database at a temp path and an empty response cache."""
+    path = tmp_path / 'fitness.db'
+    monkeypatch.setattr(db, 'DB_PATH', path)
+    db.init_db()
+    cache.configure()
+    yield path
+    db.close_conn()
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def member(client):
+    """A client whose session has filled in the survey."""
+    response = client.post('/api/survey', json={'age': 30, 'current_weight': 180, 'goal_weight': 170, 'weeks': 10})
+    assert response.status_code == 200
+    return client
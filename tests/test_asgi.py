@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import asgi
+
+
+def call(scope, body=b''):
+    """Run one request through the ASGI app; returns (status, body)."""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await asgi.app(scope, receive, send)
+
+    asyncio.run(run())
+    status = next(m['status'] for m in sent if m['type'] == 'http.response.start')
+    return status, b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+
+
+def http_scope(path, headers):
+    return {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '2', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+            'query_string': b'', 'headers': headers, 'server': ('testserver', 80), 'client': ('127.0.0.1', 1)}
+
+
+def test_split_cookie_headers_are_joined_with_semicolons():
+    headers = [(b'cookie', b'a=1'), (b'accept', b'*/*'), (b'cookie', b'session=x')]
+    assert asgi._join_cookie_headers(headers) == [(b'accept', b'*/*'), (b'cookie', b'a=1; session=x')]
+
+
+def test_session_cookie_in_its_own_header_is_recognised(member):
+    session = member.get_cookie('session').value.encode()
+    headers = [(b'cookie', b'theme=dark'), (b'cookie', b'session=' + session)]
+    status, body = call(http_scope('/api/profile', headers))
+    assert status == 200
+    assert json.loads(body)['profile']['current_weight'] == 180
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import app as app_module
+import db
+
+
+def test_slow_source_does_not_hold_the_write_lock(monkeypatch):
+    monkeypatch.setattr(db, 'BUSY_TIMEOUT_MS', 200)
+    slow_user, other_user = db.create_user(), db.create_user()
+    started = threading.Event()
+
+    def slow_rows():
+        started.set()
+        for _ in range(3):
+            time.sleep(0.2)
+            yield '2025-01-01', 'Slow', 100
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(n=db.add_meals(slow_user, slow_rows())))
+    thread.start()
+    started.wait()
+    # Would fail with "database is locked" if the rows were read inside BEGIN IMMEDIATE
+    db.add_meal(other_user, '2025-01-01', 'Fast', 200)
+    thread.join()
+    db.close_conn()
+
+    assert result['n'] == 3
+    assert db.get_meals_for_date(other_user, '2025-01-01') == ([{'description': 'Fast', 'calories': 200}], 200)
+
+
+def test_bulk_upload_is_inserted_in_chunks(member, monkeypatch):
+    monkeypatch.setattr(app_module, 'BULK_CHUNK_ROWS', 2)
+    chunks = []
+    add_meals = db.add_meals
+
+    def recording_add_meals(user_id, rows):
+        chunks.append(len(rows))
+        return add_meals(user_id, rows)
+
+    monkeypatch.setattr(db, 'add_meals', recording_add_meals)
+    meals = [{'date': '2025-01-01', 'description': f'Meal {i}', 'calories': 100} for i in range(5)]
+    meals.insert(2, {'date': '2025-01-01', 'description': '', 'calories': 100})
+
+    body = member.post('/api/add-meals', json=meals).get_json()
+
+    assert body['inserted'] == 5
+    assert body['rejected'] == 1
+    assert body['errors'][0]['index'] == 2
+    assert chunks == [2, 2, 1]
+
+
+def test_ndjson_upload(member):
+    lines = b'{"date": "2025-01-02", "description": "Oats", "calories": 300}\nnot json\n'
+    body = member.post('/api/add-meals', data=lines, content_type='application/x-ndjson').get_json()
+    assert (body['inserted'], body['rejected']) == (1, 1)
+    assert member.get('/api/meals/2025-01-02').get_json()['total_calories'] == 300
+
+
+def test_rejects_a_body_that_is_not_an_array(member):
+    response = member.post('/api/add-meals', json={'date': '2025-01-01'})
+    assert response.status_code == 400
@@ -0,0 +1,93 @@
+import cache
+import db
+
+
+def test_repeat_reads_are_served_from_the_cache():
+    user_id = db.create_user()
+    db.add_meal(user_id, '2025-01-01', 'Toast', 200)
+    response_cache = cache.get_cache()
+    db.get_meals_for_date(user_id, '2025-01-01')
+    db.get_meals_for_date(user_id, '2025-01-01')
+    assert (response_cache.hits, response_cache.misses) == (1, 1)
+
+
+def test_a_write_drops_only_the_date_it_touched():
+    user_id = db.create_user()
+    db.add_meal(user_id, '2025-01-01', 'Toast', 200)
+    db.get_meals_for_date(user_id, '2025-01-01')
+    db.get_meals_for_date(user_id, '2025-01-02')
+
+    db.add_meal(user_id, '2025-01-01', 'Soup', 300)
+    response_cache = cache.get_cache()
+    assert response_cache.get(user_id, '2025-01-01', 'meals@1') is None
+    assert response_cache.get(user_id, '2025-01-02', 'meals@0') == ([], 0)
+    assert db.get_meals_for_date(user_id, '2025-01-01')[1] == 500
+
+
+def test_weights_and_workouts_are_invalidated_by_their_writes():
+    user_id = db.create_user()
+    assert db.get_weights(user_id) == []
+    assert db.get_workouts_for_date(user_id, '2025-01-01')[1] == 0
+    db.add_weight(user_id, '2025-01-01', 180.0)
+    db.add_workout(user_id, '2025-01-01', 'Run', 30, 250)
+    assert len(db.get_weights(user_id)) == 1
+    assert db.get_workouts_for_date(user_id, '2025-01-01')[1] == 250
+
+
+def test_a_read_racing_a_write_is_not_cached():
+    response_cache = cache.get_cache()
+
+    def stale_read():
+        # The invalidation lands after the read ran but before it is stored
+        response_cache.invalidate(1, '2025-01-01')
+        return 'stale'
+
+    assert response_cache.get_or_compute(1, '2025-01-01', 'meals', stale_read) == 'stale'
+    assert response_cache.get(1, '2025-01-01', 'meals') is None
+    assert response_cache.get_or_compute(1, '2025-01-01', 'meals', lambda: 'fresh') == 'fresh'
+    assert response_cache.get(1, '2025-01-01', 'meals') == 'fresh'
+
+
+def test_invalidate_user_leaves_other_users_cached():
+    response_cache = cache.get_cache()
+    response_cache.put(1, '2025-01-01', 'meals', 'one')
+    response_cache.put(2, '2025-01-01', 'meals', 'two')
+    response_cache.invalidate_user(1)
+    assert response_cache.get(1, '2025-01-01', 'meals') is None
+    assert response_cache.get(2, '2025-01-01', 'meals') == 'two'
+
+
+def test_clear_all_data_empties_the_cache():
+    user_id = db.create_user()
+    db.add_meal(user_id, '2025-01-01', 'Toast', 200)
+    db.get_meals_for_date(user_id, '2025-01-01')
+    db.clear_all_data()
+    assert cache.get_cache().get(user_id, '2025-01-01', 'meals@1') is None
+
+
+class DictBackend(dict):
+    """Stand-in for a shared store: get/set/delete/clear."""
+
+    def set(self, key, value):
+        self[key] = value
+
+    def delete(self, key):
+        self.pop(key, None)
+
+
+def test_pluggable_backend():
+    backend = DictBackend()
+    cache.configure(backend)
+    user_id = db.create_user()
+    db.get_meals_for_date(user_id, '2025-01-01')
+    assert any(key.endswith(':2025-01-01') for key in backend)
+    assert cache.get_cache().stats()['backend'] == 'DictBackend'
+
+
+def test_disabled_cache_always_reads_the_database():
+    cache.configure(enabled=False)
+    user_id = db.create_user()
+    db.get_meals_for_date(user_id, '2025-01-01')
+    db.add_meal(user_id, '2025-01-01', 'Toast', 200)
+    assert db.get_meals_for_date(user_id, '2025-01-01')[1] == 200
+    assert cache.get_cache().stats()['hits'] == 0
@@ -0,0 +1,41 @@
+import analytics
+import db
+import fitness_cli
+import tracking
+
+
+def export_csv(user_id, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for chunk in tracking._export_csv(db.iter_export(user_id)):
+            f.write(chunk)
+
+
+def test_an_export_imports_back_including_days_without_a_goal(tmp_path, capsys):
+    source = db.create_user()
+    db.add_meal(source, '2025-01-01', 'Toast', 200)
+    db.add_weight(source, '2025-01-01', 180.0)
+    # No profile: the snapshot is stored with daily_goal 0
+    db.finalize_days('2025-01-02', analytics.percent_reached)
+    path = tmp_path / 'export.csv'
+    export_csv(source, path)
+
+    target = db.create_user()
+    assert fitness_cli.main(['import', str(target), str(path)]) == 0
+    assert '1 meal, 0 workout, 1 weight, 1 completed_day, 0 rejected' in capsys.readouterr().out
+    assert db.get_completed_day(target, '2025-01-01') == db.get_completed_day(source, '2025-01-01')
+
+    # A re-run skips the entries it already loaded (weights and days are upserts)
+    assert fitness_cli.main(['import', str(target), str(path)]) == 0
+    assert '0 meal, 0 workout, 1 weight, 1 completed_day, 0 rejected, 1 skipped' in capsys.readouterr().out
+    assert db.get_meals_for_date(target, '2025-01-01')[1] == 200
+
+
+def test_invalid_rows_are_reported_and_fail_the_command(tmp_path, capsys):
+    user_id = db.create_user()
+    path = tmp_path / 'rows.ndjson'
+    path.write_text('{"type": "meal", "date": "2025-01-01", "description": "Toast", "calories": -5}\n'
+                    '{"type": "completed_day", "date": "2025-01-01", "calories_eaten": 0, '
+                    '"calories_burned": 0, "daily_goal": 0}\n')
+    assert fitness_cli.main(['import', str(user_id), str(path)]) == 1
+    assert 'calories must be positive' in capsys.readouterr().err
+    assert db.get_completed_day(user_id, '2025-01-01')['daily_goal'] == 0
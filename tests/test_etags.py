@@ -0,0 +1,78 @@
+import db
+
+MEAL = {'date': '2025-01-01', 'description': 'Toast', 'calories': 200}
+
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={'If-None-Match': etag})
+
+
+def test_unchanged_data_is_answered_with_304(member):
+    member.post('/api/add-meal', json=MEAL)
+    first = member.get('/api/meals/2025-01-01')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = revalidate(member, '/api/meals/2025-01-01', first.headers['ETag'])
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+def test_a_write_changes_the_etag_of_its_date_only(member):
+    meals = member.get('/api/meals/2025-01-01')
+    other_day = member.get('/api/meals/2025-01-02')
+
+    member.post('/api/add-meal', json=MEAL)
+    changed = revalidate(member, '/api/meals/2025-01-01', meals.headers['ETag'])
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != meals.headers['ETag']
+    assert changed.get_json()['total_calories'] == 200
+    assert revalidate(member, '/api/meals/2025-01-02', other_day.headers['ETag']).status_code == 304
+
+
+def test_version_moves_with_every_write():
+    user_id = db.create_user()
+    assert db.get_version(user_id, '2025-01-01') == 0
+    db.add_meal(user_id, '2025-01-01', 'Toast', 200)
+    db.add_workout(user_id, '2025-01-01', 'Run', 30, 250)
+    assert db.get_version(user_id, '2025-01-01') == 2
+    db.add_weight(user_id, '2025-01-01', 180.0)
+    assert db.get_version(user_id, 'weights') == 1
+
+
+def test_weights_etag_follows_weight_writes(member):
+    weights = member.get('/api/weights')
+    assert revalidate(member, '/api/weights', weights.headers['ETag']).status_code == 304
+    member.post('/api/weight', json={'date': '2025-01-01', 'weight': 180})
+    assert revalidate(member, '/api/weights', weights.headers['ETag']).status_code == 200
+
+
+def test_summary_etag_changes_with_the_goal(member):
+    summary = member.get('/api/daily-summary/2099-01-01')
+    member.post('/api/survey', json={'age': 30, 'current_weight': 180, 'goal_weight': 160, 'weeks': 10})
+    assert revalidate(member, '/api/daily-summary/2099-01-01', summary.headers['ETag']).status_code == 200
+
+
+def test_etags_differ_between_users(member):
+    from app import app
+    other = app.test_client()
+    other.post('/api/survey', json={'age': 40, 'current_weight': 200, 'goal_weight': 190, 'weeks': 10})
+    mine = member.get('/api/meals/2025-01-01')
+    theirs = revalidate(other, '/api/meals/2025-01-01', mine.headers['ETag'])
+    assert theirs.status_code == 200
+
+
+def test_a_write_whose_invalidation_never_arrives_is_not_served_stale(member, monkeypatch):
+    # As for a write made by fitness_cli.py, or one whose after-commit
+    # invalidation has not run yet
+    member.post('/api/add-meal', json=MEAL)
+    before = member.get('/api/meals/2025-01-01')
+    monkeypatch.setattr(db, '_invalidate', lambda *args: None)
+    user_id = db.list_users()[-1]['id']
+    db.add_meal(user_id, '2025-01-01', 'Soup', 300)
+
+    after = revalidate(member, '/api/meals/2025-01-01', before.headers['ETag'])
+    assert after.status_code == 200
+    assert after.get_json()['total_calories'] == 500
+    assert revalidate(member, '/api/meals/2025-01-01', after.headers['ETag']).status_code == 304
@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+
+import db
+
+
+def seed(user_id):
+    db.add_meals(user_id, [('2025-01-01', 'Toast', 200), ('2025-01-02', 'Soup', 300), ('2025-02-01', 'Rice', 400)])
+    db.add_workout(user_id, '2025-01-01', 'Run', 30, 250)
+    db.add_weight(user_id, '2025-01-01', 180.0)
+
+
+def test_iter_export_yields_every_record_type():
+    user_id = db.create_user()
+    seed(user_id)
+    records = list(db.iter_export(user_id))
+    assert [t for t, _ in records] == ['meal', 'meal', 'meal', 'workout', 'weight']
+    assert records[0][1] == {'date': '2025-01-01', 'description': 'Toast', 'calories': 200}
+
+
+def test_iter_export_reads_one_snapshot_in_batches():
+    user_id = db.create_user()
+    seed(user_id)
+    records = db.iter_export(user_id, batch_size=1)
+    assert next(records)[1]['description'] == 'Toast'
+    db.add_meal(user_id, '2025-01-03', 'Late', 100)
+    assert [row.get('description') for t, row in records if t == 'meal'] == ['Soup', 'Rice']
+
+
+def test_csv_export(member):
+    member.post('/api/add-meal', json={'date': '2025-01-01', 'description': 'Toast, buttered', 'calories': 200})
+    member.post('/api/weight', json={'date': '2025-01-01', 'weight': 180})
+    response = member.get('/api/export')
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename="fitness-export-')
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(r['type'], r['description'], r['weight']) for r in rows] == [
+        ('meal', 'Toast, buttered', ''), ('weight', '', '180.0')]
+
+
+def test_ndjson_export_is_limited_to_the_range(member, monkeypatch):
+    monkeypatch.setattr(db, 'EXPORT_BATCH_SIZE', 1)
+    for date in ('2025-01-01', '2025-01-15', '2025-02-01'):
+        member.post('/api/add-meal', json={'date': date, 'description': 'Meal', 'calories': 100})
+    response = member.get('/api/export?format=ndjson&start=2025-01-10&end=2025-01-31')
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {'type': 'meal', 'date': '2025-01-15', 'description': 'Meal', 'calories': 100.0}]
+
+
+def test_export_rejects_unknown_formats(member):
+    assert member.get('/api/export?format=xml').status_code == 400
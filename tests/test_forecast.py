@@ -0,0 +1,54 @@
+from datetime import date
+
+import cache
+import db
+import forecast
+
+
+def log_weights(user_id, *entries):
+    for day, weight in entries:
+        db.add_weight(user_id, day, weight)
+
+
+def cached_state(user_id):
+    return cache.get_cache().get(user_id, 'forecast', 'state')
+
+
+def test_new_weeks_are_folded_into_the_cached_state():
+    user_id = db.create_user()
+    log_weights(user_id, ('2025-01-06', 180.0), ('2025-01-13', 179.0))
+    assert forecast.get_forecast(user_id, 170.0, date(2025, 1, 20))['points'] == 2
+    log_weights(user_id, ('2025-01-20', 178.0))
+    result = forecast.get_forecast(user_id, 170.0, date(2025, 1, 20))
+    assert result['points'] == 3
+    assert result == forecast._build(user_id, forecast.fold(forecast._new_state(), db.get_weights(user_id)),
+                                     170.0, date(2025, 1, 20))
+
+
+def test_an_update_never_modifies_the_shared_cached_state():
+    user_id = db.create_user()
+    log_weights(user_id, ('2025-01-06', 180.0), ('2025-01-13', 179.0))
+    forecast.get_forecast(user_id, None, date(2025, 1, 20))
+    # What a second thread (the rollup refresher) holds while this one updates
+    shared = cached_state(user_id)
+    log_weights(user_id, ('2025-01-20', 178.0))
+
+    forecast.get_forecast(user_id, None, date(2025, 1, 20))
+    assert shared['points'] == 2
+    assert len(shared['window']) == 2
+    updated = forecast._update_state(user_id, shared, db.get_latest_seq(user_id))
+    assert updated['points'] == cached_state(user_id)['points'] == 3
+
+
+def test_changes_newer_than_latest_seq_are_not_folded_twice():
+    user_id = db.create_user()
+    log_weights(user_id, ('2025-01-06', 180.0))
+    forecast.get_forecast(user_id, None, date(2025, 1, 20))
+    log_weights(user_id, ('2025-01-13', 179.0))
+    latest_seq = db.get_latest_seq(user_id)
+    # Committed after this request read latest_seq
+    log_weights(user_id, ('2025-01-20', 178.0))
+
+    state = forecast._update_state(user_id, cached_state(user_id), latest_seq)
+    cache.get_cache().put(user_id, 'forecast', 'state', state)
+    assert forecast.get_forecast(user_id, None, date(2025, 1, 21))['points'] == 3
@@ -0,0 +1,142 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import analytics
+import db
+import scheduler
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **delta):
+        self.now += timedelta(**delta)
+
+
+def test_jobs_run_when_due():
+    clock = Clock(datetime(2025, 1, 1, 12, 0))
+    calls = []
+    job = scheduler.Job('tick', calls.append, timedelta(minutes=5), first_delay=timedelta(seconds=30))
+    runner = scheduler.Scheduler([job], clock=clock)
+
+    assert runner.run_pending() == []
+    assert runner.seconds_until_next() == 30
+    clock.advance(seconds=30)
+    assert runner.run_pending() == ['tick']
+    clock.advance(minutes=4)
+    assert runner.run_pending() == []
+    clock.advance(minutes=1)
+    assert runner.run_pending() == ['tick']
+    assert calls == [datetime(2025, 1, 1, 12, 0, 30), datetime(2025, 1, 1, 12, 5, 30)]
+
+
+def test_failures_back_off_then_return_to_the_interval():
+    clock = Clock(datetime(2025, 1, 1, 12, 0))
+    outcomes = [RuntimeError('down'), RuntimeError('down'), RuntimeError('down'), None]
+
+    def flaky(now):
+        error = outcomes.pop(0)
+        if error:
+            raise error
+
+    job = scheduler.Job('flaky', flaky, timedelta(minutes=15), first_delay=timedelta(0))
+    runner = scheduler.Scheduler([job], clock=clock, retry_base=30, retry_max=90)
+
+    delays = []
+    for _ in range(3):
+        started = clock.now
+        assert runner.run_pending() == ['flaky']
+        delays.append(job.next_run - started)
+        clock.now = job.next_run
+    assert delays == [timedelta(seconds=30), timedelta(seconds=60), timedelta(seconds=90)]
+    assert (job.failures, job.last_error) == (3, 'down')
+
+    assert runner.run_pending() == ['flaky']
+    assert (job.failures, job.last_error, job.last_success) == (0, None, clock.now)
+    assert job.next_run == clock.now + timedelta(minutes=15)
+
+
+def completed(user_id):
+    with db.connection() as conn:
+        rows = conn.execute('SELECT date, calories_eaten, daily_goal, percent_reached FROM completed_days '
+                            'WHERE user_id = ? ORDER BY date', (user_id,)).fetchall()
+    return [tuple(r) for r in rows]
+
+
+def set_goal(user_id, goal, effective_from='2025-01-01'):
+    profile = {'age': 30, 'current_weight': 180, 'goal_weight': 170, 'weeks': 10, 'daily_calorie_goal': goal}
+    db.save_profile(user_id, profile, effective_from)
+
+
+def test_finalize_days_follows_the_clock_and_later_changes():
+    user_id = db.create_user()
+    set_goal(user_id, 2000)
+    db.add_meal(user_id, '2025-01-01', 'Lunch', 1000)
+    db.add_meal(user_id, '2025-01-02', 'Lunch', 500)
+    clock = Clock(datetime(2025, 1, 2, 9, 0))
+    job = scheduler.Job('finalize_days', scheduler.DayFinalizer(), timedelta(minutes=15), first_delay=timedelta(0))
+    runner = scheduler.Scheduler([job], clock=clock)
+
+    runner.run_pending()
+    assert completed(user_id) == [('2025-01-01', 1000, 2000, 50)]
+
+    # The next day: 2025-01-02 is now past, with no new entries since the last run
+    clock.advance(days=1)
+    runner.run_pending()
+    assert completed(user_id) == [('2025-01-01', 1000, 2000, 50), ('2025-01-02', 500, 2000, 25)]
+
+    # A late entry and a goal change refresh the snapshots they affect
+    db.add_meal(user_id, '2025-01-01', 'Dinner', 500)
+    set_goal(user_id, 1500)
+    clock.advance(minutes=15)
+    runner.run_pending()
+    assert completed(user_id) == [('2025-01-01', 1500, 1500, 100), ('2025-01-02', 500, 1500, 33)]
+    assert job.failures == 0
+
+
+def test_an_incremental_run_leaves_unchanged_users_alone():
+    user_id = db.create_user()
+    db.add_meal(user_id, '2025-01-01', 'Lunch', 1000)
+    assert db.finalize_days('2025-02-01', analytics.percent_reached, users=[], since='2025-01-02') == 0
+    assert db.finalize_days('2025-02-01', analytics.percent_reached, users=[user_id]) == 1
+    assert db.finalize_days('2025-02-01', analytics.percent_reached) == 0
+
+
+def test_finalize_days_pages_through_every_stale_day():
+    first, second = db.create_user(), db.create_user()
+    for user_id in (first, second):
+        db.add_meals(user_id, [(f'2025-01-{day:02d}', 'Meal', 100) for day in range(1, 8)])
+    assert db.finalize_days('2025-01-06', analytics.percent_reached, batch_size=3) == 10
+    assert len(completed(first)) == len(completed(second)) == 5
+
+
+def test_concurrent_first_requests_start_one_scheduler(monkeypatch):
+    def slow_jobs():
+        time.sleep(0.05)  # widen the window between the check and the assignment
+        return [scheduler.Job('idle', lambda now: None, timedelta(hours=1), first_delay=timedelta(hours=1))]
+
+    monkeypatch.setattr(scheduler, 'SCHEDULER_ENABLED', True)
+    monkeypatch.setattr(scheduler, '_scheduler', None)
+    monkeypatch.setattr(scheduler, 'default_jobs', slow_jobs)
+    barrier = threading.Barrier(8)
+    started = []
+
+    def first_request():
+        barrier.wait()
+        started.append(scheduler.start_in_background())
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert len({id(s) for s in started}) == 1
+        assert sum(t.name == 'scheduler' for t in threading.enumerate()) == 1
+    finally:
+        started[0].stop(timeout=5)
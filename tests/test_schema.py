@@ -0,0 +1,96 @@
+import os
+import sqlite3
+
+import db
+
+
+def baseline_db(path):
+    """A database as the app left it before versioned migrations (v0)."""
+    conn = sqlite3.connect(path)
+    db._create_tables(conn.cursor())
+    conn.executemany('INSERT INTO meals (date, description, calories) VALUES (?, ?, ?)', [
+        ('2025-01-01', 'Oatmeal', 300), ('2025-01-01', 'Chicken salad', 500), ('2025-01-02', 'Oatmeal', 320)])
+    conn.execute("INSERT INTO workouts (date, name, duration, calories) VALUES ('2025-01-01', 'Running', 30, 250)")
+    conn.executemany('INSERT INTO weights (week, date, weight) VALUES (?, ?, ?)', [
+        ('2025-W01', '2025-01-01', 181.0), ('2025-W01', '2025-01-03', 180.0)])
+    conn.executemany('''INSERT INTO completed_days (date, calories_eaten, calories_burned, net_calories,
+                        daily_goal, percent_reached) VALUES (?, ?, ?, ?, ?, ?)''', [
+        ('2025-01-01', 500, 250, 250, 2000, 12), ('2025-01-01', 800, 250, 550, 2000, 27)])
+    conn.commit()
+    conn.close()
+
+
+def test_migrates_a_baseline_database_to_the_current_version(tmp_path, monkeypatch):
+    path = tmp_path / 'old.db'
+    baseline_db(path)
+    monkeypatch.setattr(db, 'DB_PATH', path)
+
+    assert db.init_db() == 0
+    assert db.schema_version() == db.SCHEMA_VERSION == len(db.MIGRATIONS)
+    user_id = db.claim_legacy_user()
+    assert user_id is not None
+
+    # Duplicate weeks and repeated day completions are compacted to the newest
+    assert [w['weight'] for w in db.get_weights(user_id)] == [180.0]
+    with db.connection() as conn:
+        days = conn.execute('SELECT date, calories_eaten FROM completed_days WHERE user_id = ?', (user_id,)).fetchall()
+    assert [tuple(d) for d in days] == [('2025-01-01', 800)]
+
+    # Derived tables are backfilled from the existing rows
+    assert db.get_day_totals(user_id, '2025-01-01') == {
+        'calories_eaten': 800, 'calories_burned': 250, 'meal_count': 2, 'workout_count': 1}
+    changes, _ = db.get_changes(user_id)
+    assert [c['entity'] for c in changes].count('meal') == 3
+    assert {c['entity'] for c in changes} == {'meal', 'workout', 'weight'}
+    oatmeal = db.suggest(user_id, 'meal', 'oat')
+    assert [(s['text'], s['uses'], s['calories']) for s in oatmeal] == [('Oatmeal', 2, 310)]
+    assert db.suggest(user_id, 'workout', 'run')[0]['text'] == 'Running'
+
+
+def test_an_empty_baseline_gets_no_legacy_user(tmp_path, monkeypatch):
+    path = tmp_path / 'empty.db'
+    conn = sqlite3.connect(path)
+    db._create_tables(conn.cursor())
+    conn.close()
+    monkeypatch.setattr(db, 'DB_PATH', path)
+    db.init_db()
+    assert db.claim_legacy_user() is None
+
+
+def test_current_schema_is_not_touched_again(monkeypatch):
+    def fail(*args):
+        raise AssertionError('DDL ran on an up-to-date database')
+
+    monkeypatch.setattr(db, '_create_tables', fail)
+    monkeypatch.setattr(db, '_migrate', fail)
+    assert db.init_db() == db.SCHEMA_VERSION
+
+
+def test_current_schema_check_needs_no_write_lock(fresh_db, monkeypatch):
+    monkeypatch.setattr(db, 'BUSY_TIMEOUT_MS', 50)
+    holder = sqlite3.connect(fresh_db, isolation_level=None)
+    holder.execute('BEGIN IMMEDIATE')
+    try:
+        assert db.init_db() == db.SCHEMA_VERSION
+    finally:
+        holder.rollback()
+        holder.close()
+
+
+def test_init_db_leaves_no_open_connection():
+    db.init_db()
+    assert db._local.conn is None
+
+
+def test_a_handle_from_another_process_is_never_reused(monkeypatch):
+    conn = db.get_conn()
+    monkeypatch.setattr(db._local, 'pid', os.getpid() + 1)
+    assert db.get_conn() is not conn
+    assert conn in db._inherited
+    db._inherited.remove(conn)
+    conn.close()
+
+
+def test_boot_timing_is_exported(client):
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'app_boot_seconds{phase="imports"}' in body
@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def test_session_cookie_is_http_only(client):
+    response = client.post('/api/survey', json={'age': 30, 'current_weight': 180, 'goal_weight': 170, 'weeks': 10})
+    cookie = response.headers['Set-Cookie']
+    assert cookie.startswith('session=')
+    assert 'HttpOnly' in cookie
+
+
+def test_refuses_to_start_without_a_secret_key(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k not in ('SECRET_KEY', 'FLASK_DEBUG')}
+    env['FITNESS_DB_PATH'] = str(tmp_path / 'boot.db')
+    result = subprocess.run([sys.executable, '-c', 'import app'], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode != 0
+    assert 'SECRET_KEY is not set' in result.stderr
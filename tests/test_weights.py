@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+
+import db
+
+
+def test_same_week_is_updated_in_place():
+    user_id = db.create_user()
+    assert db.add_weight(user_id, '2025-03-03', 180.0) == db.add_weight(user_id, '2025-03-06', 179.0)
+    assert db.get_weights(user_id) == [{'week': db.week_key('2025-03-06'), 'date': '2025-03-06', 'weight': 179.0}]
+
+
+def test_concurrent_submissions_for_one_week_leave_one_row():
+    user_id = db.create_user()
+    barrier = threading.Barrier(8)
+
+    def submit(weight):
+        barrier.wait()
+        db.add_weight(user_id, '2025-03-04', weight)
+        db.close_conn()
+
+    threads = [threading.Thread(target=submit, args=(170.0 + i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with db.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM weights WHERE user_id = ?', (user_id,)).fetchone()[0] == 1
+
+
+def test_weeks_are_per_user():
+    first, second = db.create_user(), db.create_user()
+    db.add_weight(first, '2025-03-04', 180.0)
+    db.add_weight(second, '2025-03-04', 150.0)
+    assert db.get_weights(first)[0]['weight'] == 180.0
+    assert db.get_weights(second)[0]['weight'] == 150.0
+
+
+def test_api_pages_through_a_date_range(member):
+    for day in range(1, 29, 7):  # four weeks of February
+        member.post('/api/weight', json={'date': f'2025-02-{day:02d}', 'weight': 180 - day})
+
+    page = member.get('/api/weights?start=2025-02-02&limit=2').get_json()
+    assert [w['date'] for w in page['weights']] == ['2025-02-08', '2025-02-15']
+    assert page['next'] == '2025-02-15'
+
+    page = member.get(f"/api/weights?start=2025-02-02&limit=2&after={page['next']}").get_json()
+    assert [w['date'] for w in page['weights']] == ['2025-02-22']
+    assert page['next'] is None
+
+    bounded = member.get('/api/weights?end=2025-02-08').get_json()
+    assert [w['date'] for w in bounded['weights']] == ['2025-02-01', '2025-02-08']
+
+
+def test_upgrade_keeps_the_newest_row_of_each_week(tmp_path, monkeypatch):
+    path = tmp_path / 'old.db'
+    conn = sqlite3.connect(path)
+    db._create_tables(conn.cursor())
+    conn.executemany('INSERT INTO weights (week, date, weight) VALUES (?, ?, ?)', [
+        ('2025-W10', '2025-03-03', 181.0),
+        ('2025-W10', '2025-03-05', 180.0),
+        ('2025-W11', '2025-03-10', 179.0),
+    ])
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(db, 'DB_PATH', path)
+    db.init_db()
+    user_id = db.claim_legacy_user()
+    assert [(w['week'], w['weight']) for w in db.get_weights(user_id)] == [('2025-W10', 180.0), ('2025-W11', 179.0)]
@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+import pytest
+
+import db
+import writer
+
+
+@pytest.fixture
+def group_writer():
+    group = writer.configure(partial(db.connection, write=True), window_ms=200, max_rows=64)
+    yield group
+    writer.configure(partial(db.connection, write=True), window_ms=0)
+
+
+def meal_count(user_id):
+    with db.connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM meals WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+
+def failing_insert(user_id):
+    with db.connection(write=True) as conn:
+        conn.execute("INSERT INTO meals (user_id, date, description, calories) VALUES (?, '2025-01-01', 'Bad', 1)",
+                     (user_id,))
+        raise ValueError('rejected')
+
+
+def test_concurrent_writes_share_a_commit(group_writer):
+    user_id = db.create_user()
+    ids = []
+
+    def log(n):
+        ids.append(db.add_meal(user_id, '2025-01-01', f'Meal {n}', 100))
+        db.close_conn()
+
+    threads = [threading.Thread(target=log, args=(n,)) for n in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(ids) == list(range(min(ids), min(ids) + 10))
+    assert meal_count(user_id) == 10
+    assert group_writer.batches < 10
+    assert db.get_day_totals(user_id, '2025-01-01')['calories_eaten'] == 1000
+
+
+def test_a_failing_call_is_rolled_back_alone(group_writer):
+    user_id = db.create_user()
+    before = group_writer.submit(db._add_entry, 'meal', user_id, ('2025-01-01', 'Before', 100))
+    bad = group_writer.submit(failing_insert, user_id)
+    after = group_writer.submit(db._add_entry, 'meal', user_id, ('2025-01-01', 'After', 200))
+
+    assert before.result() and after.result()
+    with pytest.raises(ValueError, match='rejected'):
+        bad.result()
+    assert group_writer.batches == 1
+    assert db.get_meals_for_date(user_id, '2025-01-01') == (
+        [{'description': 'Before', 'calories': 100}, {'description': 'After', 'calories': 200}], 300)
+
+
+def test_a_failed_commit_fails_every_caller():
+    @contextmanager
+    def failing_commit():
+        with db.connection(write=True) as conn:
+            yield conn
+            raise sqlite3.OperationalError('disk I/O error')
+
+    group = writer.GroupCommitWriter(failing_commit, window_ms=200)
+    user_id = db.create_user()
+    futures = [group.submit(db._add_entry, 'meal', user_id, ('2025-01-01', f'Meal {n}', 100)) for n in range(3)]
+    for future in futures:
+        with pytest.raises(sqlite3.OperationalError):
+            future.result()
+    group.close()
+    assert meal_count(user_id) == 0
+
+
+def test_close_flushes_queued_writes():
+    group = writer.GroupCommitWriter(partial(db.connection, write=True), window_ms=60000)
+    user_id = db.create_user()
+    futures = [group.submit(db._add_entry, 'meal', user_id, ('2025-01-01', f'Meal {n}', 100)) for n in range(3)]
+    group.close(timeout=5)
+    assert all(f.done() for f in futures)
+    assert meal_count(user_id) == 3
+    # Calls after close run directly in the caller's thread
+    assert group.call(db._add_entry, 'meal', user_id, ('2025-01-01', 'Late', 100))
+    assert meal_count(user_id) == 4
+
+
+def test_writes_inside_a_transaction_bypass_the_writer(group_writer):
+    user_id = db.create_user()
+    with db.connection(write=True):
+        db.add_meal(user_id, '2025-01-01', 'Nested', 100)
+        db.add_weight(user_id, '2025-01-01', 180.0)
+    assert group_writer.batches == 0
+    assert meal_count(user_id) == 1
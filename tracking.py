@@ -1,6 +1,13 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify
 from datetime import datetime
+import csv
+import io
+import json
+import analytics
 import db
+import forecast
+from etags import conditional
+from users import current_user_id
 
 tracking_bp = Blueprint('tracking', __name__)
 
@@ -12,24 +19,22 @@ def complete_day():
     if not date:
         return jsonify({"error": "date is required"}), 400
 
-    # Use db helpers to fetch meals and workouts for the date
-    meals, calories_eaten = db.get_meals_for_date(date)
-    workouts, calories_burned = db.get_workouts_for_date(date)
+    # Read the day's precomputed totals
+    user_id = current_user_id()
+    totals = db.get_day_totals(user_id, date)
+    calories_eaten = totals['calories_eaten']
+    calories_burned = totals['calories_burned']
 
-    # Get daily goal from session if available
-    daily_goal = 0
-    if 'user_profile' in session:
-        daily_goal = session['user_profile'].get('daily_calorie_goal', 0)
+    # The goal that applied on that day (0 without a profile)
+    daily_goal = db.goal_for_date(user_id, date)
 
     net_calories = calories_eaten - calories_burned
 
-    percent_reached = 0
-    if daily_goal > 0:
-        percent_reached = int(round(max(0, min(100, (net_calories / daily_goal) * 100))))
+    percent_reached = analytics.percent_reached(net_calories, daily_goal)
 
     # Persist completed day record
     try:
-        db.add_completed_day(date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached)
+        db.add_completed_day(user_id, date, calories_eaten, calories_burned, net_calories, daily_goal, percent_reached)
     except Exception:
         # Non-fatal: still return the computation
         pass
@@ -56,17 +61,110 @@ def add_weight():
         return jsonify({"error": "date and weight are required"}), 400
 
     try:
-        key = db.add_weight(date, float(weight))
+        key = db.add_weight(current_user_id(), date, float(weight))
     except Exception as e:
         return jsonify({"error": f"invalid data: {e}"}), 400
 
     return jsonify({"success": True, "week": key, "weight": float(weight)})
 
 
+WEIGHTS_PAGE_SIZE = 520   # ten years of weekly entries
+WEIGHTS_MAX_PAGE_SIZE = 1000
+
+
 @tracking_bp.route('/api/weights')
 def get_weights():
+    """Weekly weights, optionally limited to start..end and paged.
+
+    Pass the returned "next" value as ?after= to fetch the following page.
+    """
     try:
-        items = db.get_weights()
-    except Exception:
-        items = []
-    return jsonify({"weights": items})
+        limit = min(int(request.args.get('limit', WEIGHTS_PAGE_SIZE)), WEIGHTS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit <= 0:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    user_id = current_user_id(create=False)
+
+    def build():
+        try:
+            items = db.get_weights(user_id,
+                                   start=request.args.get('start'),
+                                   end=request.args.get('end'),
+                                   limit=limit + 1,
+                                   after=request.args.get('after'))
+        except Exception:
+            items = []
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = items[-1]['date']
+        return jsonify({"weights": items, "next": next_cursor})
+
+    return conditional(user_id, 'weights', build)
+
+
+@tracking_bp.route('/api/weights/forecast')
+def get_weight_forecast():
+    """Smoothed weight trend and the projected date of reaching the goal weight.
+
+    The trend-based projection is cross-checked against the weight change
+    the last 30 days of logged calories imply.
+    """
+    user_id = current_user_id(create=False)
+    if user_id is None:
+        return jsonify({"error": "User profile not found"}), 400
+    profile = db.get_profile(user_id)
+    return jsonify(forecast.get_forecast(user_id, profile['goal_weight'] if profile else None))
+
+
+EXPORT_FIELDS = ['type', 'date', 'description', 'name', 'duration', 'calories', 'week', 'weight',
+                 'calories_eaten', 'calories_burned', 'net_calories', 'daily_goal', 'percent_reached']
+
+
+def _export_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for count, (record_type, row) in enumerate(records, start=1):
+        writer.writerow(dict(row, type=record_type))
+        if count % db.EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_ndjson(records):
+    lines = []
+    for record_type, row in records:
+        lines.append(json.dumps({'type': record_type, **row}) + '\n')
+        if len(lines) == db.EXPORT_BATCH_SIZE:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+@tracking_bp.route('/api/export')
+def export_data():
+    """Stream all of the user's meals, workouts, weights and completed days.
+
+    Query: format=csv|ndjson (default csv), optional start/end dates.
+    Every row carries a "type" column (meal, workout, weight,
+    completed_day). The body is generated batch by batch while it is sent.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    start = request.args.get('start') or ''
+    end = request.args.get('end') or '9999-12-31'
+
+    records = db.iter_export(current_user_id(create=False), start, end)
+    if fmt == 'csv':
+        body, mimetype = _export_csv(records), 'text/csv'
+    else:
+        body, mimetype = _export_ndjson(records), 'application/x-ndjson'
+    filename = f"fitness-export-{datetime.now().strftime('%Y%m%d')}.{fmt}"
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
@@ -0,0 +1,40 @@
+from datetime import date
+from flask import session
+import db
+
+
+def current_user_id(create=True):
+    """Return the id of the user behind this session.
+
+    A user row is created on first write so each browser gets its own
+    partition of the data. Read-only callers pass create=False and get None
+    when the session has no user yet (queries then simply match nothing).
+    The first session to need a user after the upgrade to per-user data
+    takes over what was logged before (the single-user app's data) instead.
+    """
+    user_id = session.get('user_id')
+    if user_id is None and create:
+        user_id = db.claim_legacy_user() or db.create_user()
+        session['user_id'] = user_id
+    return user_id
+
+
+def current_profile():
+    """The session user's latest profile, or None before the survey."""
+    user_id = current_user_id(create=False)
+    return db.get_profile(user_id) if user_id is not None else None
+
+
+def adopt_session_profile():
+    """Move a profile from an old-style session cookie into the database.
+
+    Sessions used to carry the whole profile; the cookie now only holds the
+    user id. A leftover profile is saved once (unless the user already has
+    one) and dropped from the cookie.
+    """
+    profile = session.pop('user_profile', None)
+    if profile and current_profile() is None:
+        try:
+            db.save_profile(current_user_id(), profile, date.today().isoformat())
+        except (KeyError, TypeError):
+            pass
@@ -0,0 +1,162 @@
+"""Group commit for single-entry writes (optional).
+
+Every add_meal/add_workout/add_weight/add_completed_day normally runs in
+its own transaction, so each logged item takes SQLite's write lock and
+syncs the WAL on its own. With GROUP_COMMIT_WINDOW_MS > 0, db routes those
+calls through one writer thread per process instead: it collects whatever
+arrives within the window (or until GROUP_COMMIT_MAX_ROWS calls are
+waiting) and runs them all in a single transaction.
+
+Durability contract:
+    - A caller is only answered once the transaction holding its write has
+      committed, so an acknowledged write is exactly as durable as a
+      direct one (WAL with synchronous=NORMAL: survives a crash of the
+      app, the last commits may be lost on power failure).
+    - Each call runs in its own savepoint. A call that raises is rolled
+      back alone and its caller gets the exception; the rest of the batch
+      still commits. If the commit itself fails, every caller in the batch
+      gets that error and nothing of the batch is stored.
+    - close() (registered with atexit, and called on ASGI shutdown) stops
+      accepting work, commits everything already queued and waits for it.
+      Calls made after close() run directly in the caller's thread.
+The cost is up to one window of extra latency per write.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 0))
+GROUP_COMMIT_MAX_ROWS = int(os.environ.get('GROUP_COMMIT_MAX_ROWS', 64))
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    def __init__(self, transaction, window_ms=GROUP_COMMIT_WINDOW_MS, max_rows=GROUP_COMMIT_MAX_ROWS):
+        """transaction() must return a context manager yielding a connection
+        inside a write transaction (db.connection(write=True))."""
+        self.transaction = transaction
+        self.window = window_ms / 1000
+        self.max_rows = max(1, max_rows)
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) for the next group commit; returns a Future."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                future.set_result(fn(*args))
+                return future
+            self._ensure_thread()
+            self._queue.put((future, fn, args))
+        return future
+
+    def call(self, fn, *args):
+        """Run fn(*args) in a group commit and return its result once committed."""
+        if self.on_writer_thread():
+            return fn(*args)
+        return self.submit(fn, *args).result()
+
+    def on_writer_thread(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def _ensure_thread(self):
+        # Threads don't survive fork; a worker process starts its own
+        if self._thread is None or self._pid != os.getpid():
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='db-group-commit', daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=None):
+        """Commit everything queued so far, then stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread if self._pid == os.getpid() else None
+            if thread is not None:
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            with self.transaction() as conn:
+                for future, fn, args in batch:
+                    conn.execute('SAVEPOINT group_entry')
+                    try:
+                        outcomes.append((future, fn(*args), None))
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO group_entry')
+                        outcomes.append((future, None, e))
+                    conn.execute('RELEASE group_entry')
+        except Exception as e:
+            for future, _, _ in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {"window_ms": self.window * 1000, "max_rows": self.max_rows,
+                "batches": self.batches, "rows": self.rows}
+
+
+_writer = None
+
+
+def configure(transaction, window_ms=GROUP_COMMIT_WINDOW_MS, max_rows=GROUP_COMMIT_MAX_ROWS):
+    """Install the process-wide writer (window_ms=0 turns group commit off)."""
+    global _writer
+    if _writer is not None:
+        _writer.close()
+    _writer = GroupCommitWriter(transaction, window_ms, max_rows) if window_ms > 0 else None
+    return _writer
+
+
+def get_writer():
+    return _writer
+
+
+def close():
+    if _writer is not None:
+        _writer.close()
+
+
+atexit.register(close)